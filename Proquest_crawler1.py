@@ -1,76 +1,136 @@
 import os
+import sys
 import json
-import time
-import random
-import requests
 import re
-from bs4 import BeautifulSoup
+import argparse
+import threading
 from math import ceil
-from utils import init_env, set_cookie, update_cookie
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils import init_env
+from log import get_logger
+from metrics import init_metrics
+from profiling import add_profile_arguments, profile_run
+from parsers import make_soup, parse_results_stream
+from http_client import get_client, has_block_marker
+from rate_limiter import get_rate_limiter
+from state_db import get_crawl_state
+from archive import get_archive, results_key, delta_results_key
+from pipeline import parse_in_pool
+from retry import (RetryableError, init_retry_policy, classify_status, parse_retry_after,
+                   NETWORK, THROTTLED, SERVER_ERROR, FORBIDDEN)
 
 # 初始化环境变量
 HEADERS, MAX_RETRY_COUNT, MAX_WORKERS, MAX_CONCURRENT_REQUESTS = init_env()
 
-# 创建保存数据的目录
-os.makedirs("data/data_id", exist_ok=True)
-os.makedirs("debug_html", exist_ok=True)
+logger = get_logger("crawler1")
 
-# 固定的结果集ID和accountid
-RESULT_SET_ID = "9C676CE969C84363PQ"
-ACCOUNT_ID = "26782"
-PER_PAGE = 100  # 每页结果数
+# 两个爬虫阶段共用的HTTP客户端（连接池、Cookie）
+CLIENT = get_client(HEADERS)
 
+# 两个爬虫共用的限速器，替代固定的随机等待
+LIMITER = get_rate_limiter()
 
-def make_proquest_request(keyword, page=1, retry_count=0):
-    """构造并发送ProQuest搜索请求"""
-    if retry_count > MAX_RETRY_COUNT:
-        print(f"关键词 '{keyword}' 第 {page} 页重试次数过多")
-        return None, "重试次数过多"
+# 重试策略：指数退避，按错误类别限制重试次数
+RETRY_POLICY = init_retry_policy(MAX_RETRY_COUNT)
 
-    # 构建URL
-    base_url = f"https://www.proquest.com/results/{RESULT_SET_ID}/{page}"
-    params = {"accountid": ACCOUNT_ID}
+# 爬取状态数据库（get_crawl_state）和调试HTML归档（get_archive）在第一次使用时才打开，
+# 只导入本模块（例如bench_parsers）时不会创建数据库文件或启动后台线程
 
-    # 设置请求头
-    HEADERS['Referer'] = f'https://www.proquest.com/results/{RESULT_SET_ID}?accountid={ACCOUNT_ID}'
+# ProQuest地址，测试时可以指向本地的模拟服务器
+PROQUEST_BASE_URL = os.getenv('PROQUEST_BASE_URL', "https://www.proquest.com").rstrip('/')
 
-    try:
-        response = requests.get(base_url, headers=HEADERS, params=params)
+# 默认的结果集ID和accountid
+RESULT_SET_ID = os.getenv('PROQUEST_RESULT_SET_ID', "9C676CE969C84363PQ")
+ACCOUNT_ID = os.getenv('PROQUEST_ACCOUNT_ID', "26782")
+
+# 各关键词自己的结果集ID，批量爬取时由关键词列表指定，没有指定的使用RESULT_SET_ID
+RESULT_SETS = {}
+PER_PAGE = 100  # 每页结果数
+
+# 结果页爬取参数
+PAGES_RATIO = float(os.getenv('PAGES_RATIO', 3.2))  # 计划爬取页数 = 总结果数 / (PAGES_RATIO * PER_PAGE)
+MAX_LISTING_PAGES = int(os.getenv('MAX_LISTING_PAGES', 100))  # 单次最多爬取的结果页数
+MAX_CONSECUTIVE_EMPTY = int(os.getenv('MAX_CONSECUTIVE_EMPTY', 3))  # 连续多少个空页后停止
+LISTING_WINDOW = int(os.getenv('LISTING_WINDOW', MAX_CONCURRENT_REQUESTS))  # 同时获取的结果页数
+INCREMENTAL_KNOWN_RUN = int(os.getenv('INCREMENTAL_KNOWN_RUN', 50))  # 增量模式下连续遇到多少篇已知论文后停止翻页
+RESULTS_CACHE_TTL = float(os.getenv('HTTP_CACHE_RESULTS_TTL', 86400))  # 结果页在HTTP缓存中的有效秒数
 
-        # 保存HTML内容用于调试
-        safe_keyword = keyword.replace(' ', '_')  # 使用下划线替换空格
-        debug_filename = f"debug_html/{safe_keyword}_page_{page}.html"
-        with open(debug_filename, 'w', encoding='utf-8') as f:
-            f.write(response.text)
-        print(f"已保存HTML内容到: {debug_filename}")
 
-        # 检查响应类型
-        if response.status_code == 403:
-            print("遇到403禁止访问错误，可能需要更新Cookie")
-            HEADERS['Cookie'] = update_cookie()
-            return make_proquest_request(keyword, page, retry_count + 1)
+def is_complete_results_page(html_content):
+    """结果页是否完整（包含论文条目且不是验证码页面），只有完整的页面才写入HTTP缓存"""
+    return 'resultItem' in html_content and not has_block_marker(html_content)
 
-        # 检查是否被重定向到验证页面
-        if "verify.proquest.com" in response.url:
-            print("检测到验证页面，需要人工干预")
-            return None, "验证页面拦截"
 
-        response.raise_for_status()
+def request_proquest_page(keyword, page, incremental=False):
+    """发送一次ProQuest搜索请求，需要重试时抛出RetryableError
 
-        # 更新Cookie
-        HEADERS['Cookie'] = set_cookie(response.headers, HEADERS['Cookie'])
+    增量模式获取的结果页另外归档，完整爬取时保存的结果页HTML保持与页面文件对应。
+    """
+    # 构建URL
+    result_set_id = RESULT_SETS.get(keyword, RESULT_SET_ID)
+    base_url = f"{PROQUEST_BASE_URL}/results/{result_set_id}/{page}"
+    params = {"accountid": ACCOUNT_ID}
 
-        return response.text, None
+    # 设置请求头
+    headers = {'Referer': f'{PROQUEST_BASE_URL}/results/{result_set_id}?accountid={ACCOUNT_ID}'}
 
+    # 缓存中有完整的结果页时不发送请求，也不占用限速器和凭据
+    try:
+        response = CLIENT.get(base_url, params=params, headers=headers, limiter=LIMITER,
+                              cacheable=is_complete_results_page, cache_ttl=RESULTS_CACHE_TTL)
     except Exception as e:
-        print(f"\n请求ProQuest数据时出错: {str(e)}")
-        time.sleep(5 + random.random())
-        return make_proquest_request(keyword, page, retry_count + 1)
+        raise RetryableError(NETWORK, f"请求ProQuest数据时出错: {str(e)}")
+    profile = response.profile
+
+    # 检查响应类型
+    error_kind = classify_status(response.status_code)
+    # 被重定向到验证页面或内容中出现验证码时，客户端已提前停止下载
+    blocked = response.blocked is not None
+
+    # 保存HTML内容用于调试，按采样策略在后台压缩写入归档
+    archive_key = delta_results_key(keyword, page) if incremental else results_key(keyword, page)
+    get_archive().put(archive_key, response.text, kind="results", keyword=keyword, page=page,
+                      error=blocked or response.status_code >= 400)
+    if error_kind == FORBIDDEN:
+        logger.warning("遇到403禁止访问错误，可能需要更新Cookie")
+        CLIENT.quarantine(profile, "遇到403错误")
+        raise RetryableError(FORBIDDEN, f"关键词 '{keyword}' 第 {page} 页遇到403错误")
+
+    # 检查是否被重定向到验证页面
+    if blocked:
+        # 还有其他正常的凭据时换一组凭据重试，全部凭据都被拦截时才需要人工干预
+        if CLIENT.quarantine(profile, "遇到验证页面"):
+            raise RetryableError(FORBIDDEN, f"关键词 '{keyword}' 第 {page} 页遇到验证页面")
+        logger.error("检测到验证页面，需要人工干预")
+        return None, "验证页面拦截"
+
+    if error_kind == THROTTLED:
+        retry_after = parse_retry_after(response)
+        LIMITER.on_throttle(retry_after)
+        raise RetryableError(THROTTLED, f"关键词 '{keyword}' 第 {page} 页遇到429错误", retry_after)
+    if error_kind == SERVER_ERROR:
+        LIMITER.on_throttle(parse_retry_after(response))
+        raise RetryableError(SERVER_ERROR, f"关键词 '{keyword}' 第 {page} 页服务器错误 {response.status_code}")
+    if response.status_code >= 400:
+        logger.warning("关键词 '%s' 第 %d 页请求失败: HTTP %s", keyword, page, response.status_code)
+        return None, f"HTTP {response.status_code}"
+
+    if not getattr(response, 'from_cache', False):
+        LIMITER.on_success()
+        CLIENT.report_success(profile)
+    return response.text, None
+
+
+def make_proquest_request(keyword, page=1, incremental=False):
+    """构造并发送ProQuest搜索请求，失败时按重试策略重试"""
+    return RETRY_POLICY.call(request_proquest_page, keyword, page, incremental)
 
 
 def extract_total_results(html_content):
-    """从HTML内容中提取总结果数"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+    """从HTML内容中提取总结果数，也可以传入已解析的soup"""
+    if isinstance(html_content, str):
+        return parse_results_stream(html_content).total_results()
+    soup = make_soup(html_content)
     results_count_elem = soup.find('h1', id='pqResultsCount')
 
     if results_count_elem:
@@ -89,24 +149,29 @@ def extract_total_results(html_content):
 
 
 def extract_paper_data(html_content):
-    """从HTML内容中提取论文标题和文档ID"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+    """从HTML内容中提取论文标题和文档ID
+
+    传入字符串时用事件解析器逐条提取，遇到验证码或"没有结果"立即返回；也可以传入已解析的soup。
+    """
+    if isinstance(html_content, str):
+        return results_from_parser(parse_results_stream(html_content))
+    soup = make_soup(html_content)
     results = []
 
     # 检查是否被反爬
     if soup.find('div', id='captcha-container'):
-        print("检测到验证码页面")
+        logger.warning("检测到验证码页面")
         return None, "验证码拦截"
 
     # 检查是否有"没有结果"的提示
     no_results = soup.find('div', class_='noResults')
     if no_results:
-        print("没有找到结果")
+        logger.info("没有找到结果")
         return [], "没有结果"
 
     # 查找所有论文条目
     result_items = soup.find_all('li', class_='resultItem')
-    print(f"找到 {len(result_items)} 个论文条目")
+    logger.debug("找到 %d 个论文条目", len(result_items))
 
     for item in result_items:
         # 提取标题
@@ -127,13 +192,44 @@ def extract_paper_data(html_content):
                 "id": doc_id
             })
         else:
-            print(f"未能提取标题或ID: {str(item)[:100]}...")
+            logger.warning("未能提取标题或ID: %s...", str(item)[:100])
 
     return results, None
 
 
-def save_page_results(keyword, page, results):
-    """保存单页结果到JSON文件"""
+def results_from_parser(parser):
+    """把事件解析器的结果转换为 (论文列表, 错误信息)，与soup版本的返回值一致"""
+    if parser.captcha:
+        logger.warning("检测到验证码页面")
+        return None, "验证码拦截"
+    if parser.no_results:
+        logger.info("没有找到结果")
+        return [], "没有结果"
+
+    logger.debug("找到 %d 个论文条目", len(parser.items))
+    results = []
+    for title, doc_id in parser.items:
+        if title is None:
+            title = "未知标题"
+        if title and doc_id:
+            results.append({
+                "title": title,
+                "id": doc_id
+            })
+        else:
+            logger.warning("未能提取标题或ID: 标题=%r ID=%s", title, doc_id)
+    return results, None
+
+
+def parse_result_page(html_content):
+    """在解析进程中解析一个结果页，返回 (总结果数, 论文列表, 错误信息)，页面只解析一次"""
+    parser = parse_results_stream(html_content)
+    page_results, error = results_from_parser(parser)
+    return parser.total_results(), page_results, error
+
+
+def save_page_results(keyword, page, results, delta=False):
+    """保存单页结果到JSON文件，delta表示该页由增量模式生成"""
     # 使用下划线替换空格作为安全关键词
     safe_keyword = keyword.replace(' ', '_')
 
@@ -147,91 +243,279 @@ def save_page_results(keyword, page, results):
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
 
-    print(f"已保存第 {page} 页的 {len(results)} 篇论文到 {filename}")
+    # 在状态数据库中登记该页的论文ID
+    get_crawl_state().register_ids(keyword, page, [paper["id"] for paper in results])
+    get_crawl_state().mark_delta_page(keyword, page, delta)
+
+    logger.info("已保存第 %d 页的 %d 篇论文到 %s", page, len(results), filename)
     return filename
 
 
-def search_proquest_papers(keyword, start_page=1):
-    """搜索ProQuest论文并提取标题和文档ID"""
+def search_proquest_papers(keyword, start_page=1, on_page=None, incremental=False, resume=False):
+    """搜索ProQuest论文并提取标题和文档ID
+
+    on_page(page, results) 在每页结果保存后调用，用于把论文ID直接交给详情爬取阶段。
+    incremental为True时只保存该关键词以前没有出现过的论文，遇到连续INCREMENTAL_KNOWN_RUN篇已知论文后停止翻页。
+    resume为True时跳过上次已连续保存的结果页（起始页仍然请求，用于获取总结果数）。
+    """
     # 获取第一页内容
-    html_content, error = make_proquest_request(keyword, start_page)
+    html_content, error = make_proquest_request(keyword, start_page, incremental)
     if error:
-        print(f"获取初始页面失败: {error}")
+        logger.error("获取初始页面失败: %s", error)
         return
 
-    # 提取总结果数
-    total_results = extract_total_results(html_content)
+    # 第一页只解析一次，同时提取总结果数和论文数据
+    total_results, page_results, error = parse_result_page(html_content)
     if total_results == 0:
-        print("未找到任何结果")
+        logger.warning("未找到任何结果")
         return
 
-    print(f"总结果数: {total_results}")
+    logger.info("总结果数: %d", total_results)
 
-    # 计算需要爬取的页数 (总结果数/3.2)
-    pages_to_crawl = ceil(total_results / (3.2 * PER_PAGE))
-    print(f"计划爬取 {pages_to_crawl} 页 (总结果数/{3.2})")
+    # 计算需要爬取的页数 (总结果数/PAGES_RATIO)
+    pages_to_crawl = ceil(total_results / (PAGES_RATIO * PER_PAGE))
+    logger.info("计划爬取 %d 页 (总结果数/%s)", pages_to_crawl, PAGES_RATIO)
 
     # 爬取第一页
-    page_results, error = extract_paper_data(html_content)
     if error:
-        print(f"第{start_page}页提取失败: {error}")
+        logger.error("第%d页提取失败: %s", start_page, error)
         return
 
-    save_page_results(keyword, start_page, page_results)
-
-    # 爬取后续页面
-    consecutive_empty = 0  # 连续空页计数器
-    max_consecutive_empty = 3  # 最大允许连续空页数
-
-    # 计算实际结束页
-    end_page = min(start_page + pages_to_crawl - 1, start_page + 100)  # 限制最多爬取100页
-
-    for page in range(start_page + 1, end_page + 1):
-        print(f"正在获取第 {page} 页...")
-        html_content, error = make_proquest_request(keyword, page)
-
-        if error:
-            print(f"获取第 {page} 页失败: {error}")
-            if "验证" in error:
-                print("遇到验证页面，暂停爬取")
-                break
-            continue
-
-        page_results, error = extract_paper_data(html_content)
-
-        if error:
-            print(f"第{page}页提取失败: {error}")
-            if "验证" in error:
-                print("遇到验证页面，暂停爬取")
-                break
-            continue
+    # 增量模式的页码是新论文的分页，不记录结果页进度
+    progress = None if incremental else ListingProgress(keyword, start_page, resume)
+    if incremental:
+        # 已知的论文ID在本次保存新论文之前取出
+        known_ids = get_crawl_state().known_ids(keyword)
+        writer = DeltaWriter(keyword, known_ids, on_page)
+        save_results = writer.add
+    else:
+        known_ids = writer = None
+
+        def save_results(page, page_results):
+            save_page_results(keyword, page, page_results)
+            progress.saved(page)
+            if on_page:
+                on_page(page, page_results)
+
+    first_page = start_page + 1 if progress is None else max(start_page + 1, progress.last_saved + 1)
+    tracker = ListingStopTracker(first_page, known_ids=known_ids)
+    try:
+        if progress is None or start_page > progress.last_saved:
+            save_results(start_page, page_results)
+        if tracker.observe_known(page_results):
+            return
+
+        # 计算实际结束页，最多爬取MAX_LISTING_PAGES页
+        end_page = min(start_page + pages_to_crawl - 1, start_page + MAX_LISTING_PAGES)
+        if first_page > start_page + 1:
+            logger.info("第%d页及之前的结果页已保存，从第%d页继续", progress.last_saved, first_page)
+
+        # 并发爬取后续页面
+        crawl_result_pages(keyword, range(first_page, end_page + 1), save_results, tracker, incremental)
+    finally:
+        if writer:
+            writer.close()
+
+
+class DeltaWriter:
+    """增量模式下只保存新的论文
+
+    新论文每PER_PAGE篇组成一页，页码接在该关键词已有的最大页码之后，原有的页面文件不会被覆盖，
+    详情阶段只需要处理这些新页面。新页面在状态数据库中登记为增量页面，重新解析结果页时跳过。
+    """
+
+    def __init__(self, keyword, known_ids, on_page=None):
+        self.keyword = keyword
+        self.known_ids = known_ids
+        self.on_page = on_page
+        self.next_page = get_crawl_state().max_page(keyword) + 1
+        self.new_ids = set()
+        self._buffer = []
+
+    def add(self, page, page_results):
+        """加入一个结果页中的论文，已知的论文直接跳过"""
+        for paper in page_results:
+            paper_id = paper.get("id")
+            if paper_id and paper_id not in self.known_ids and paper_id not in self.new_ids:
+                self.new_ids.add(paper_id)
+                self._buffer.append(paper)
+        while len(self._buffer) >= PER_PAGE:
+            self._flush(PER_PAGE)
+
+    def _flush(self, count):
+        page_results, self._buffer = self._buffer[:count], self._buffer[count:]
+        save_page_results(self.keyword, self.next_page, page_results, delta=True)
+        if self.on_page:
+            self.on_page(self.next_page, page_results)
+        self.next_page += 1
+
+    def close(self):
+        """保存剩余的新论文"""
+        if self._buffer:
+            self._flush(len(self._buffer))
+        logger.info("增量爬取发现 %d 篇新论文", len(self.new_ids))
+
+
+def fetch_result_page(keyword, page, incremental=False):
+    """获取并解析一个结果页，在请求线程中执行，解析交给解析进程池"""
+    logger.debug("正在获取第 %d 页...", page)
+    html_content, error = make_proquest_request(keyword, page, incremental)
+    if error:
+        return None, f"获取第 {page} 页失败: {error}"
+    page_results, error = parse_in_pool("results", MAX_WORKERS, extract_paper_data, html_content)
+    if error:
+        return page_results, f"第{page}页提取失败: {error}"
+    return page_results, None
+
+
+class ListingProgress:
+    """记录从起始页开始连续保存到的最后一页，作为结果页阶段的续爬进度
+
+    并发爬取时页面乱序完成，只有前面的页面都保存后进度才推进；失败的页面会让进度停在它之前，
+    下次续爬时从该页重新开始。
+    """
+
+    def __init__(self, keyword, start_page, resume=False):
+        self.keyword = keyword
+        self.last_saved = start_page - 1
+        if resume:
+            saved = get_crawl_state().get_progress(keyword, "listing")
+            # 进度与起始页不连续时无法续爬
+            if saved is not None and saved >= start_page - 1:
+                self.last_saved = saved
+        self._done = set()
+        self._lock = threading.Lock()
+
+    def saved(self, page):
+        """登记一页已保存，连续保存的页码推进时更新状态数据库"""
+        with self._lock:
+            self._done.add(page)
+            last_saved = self.last_saved
+            while self.last_saved + 1 in self._done:
+                self.last_saved += 1
+                self._done.discard(self.last_saved)
+            if self.last_saved == last_saved:
+                return
+            get_crawl_state().set_progress(self.keyword, "listing", self.last_saved)
+
+
+class ListingStopTracker:
+    """按页码顺序判断结果页是否应停止爬取，页面可以乱序完成
+
+    连续MAX_CONSECUTIVE_EMPTY个空页时停止；传入known_ids（增量模式）时，连续遇到INCREMENTAL_KNOWN_RUN篇
+    已知论文也停止。只有前面的页面都完成后才检查下一页，因此并发时停止的位置与顺序爬取一致。
+    """
+
+    def __init__(self, first_page, max_consecutive_empty=MAX_CONSECUTIVE_EMPTY, known_ids=None,
+                 known_run=INCREMENTAL_KNOWN_RUN):
+        self.next_to_check = first_page  # 下一个按顺序检查的页码
+        self.max_consecutive_empty = max_consecutive_empty  # 最大允许连续空页数
+        self.consecutive_empty = 0  # 连续空页计数器
+        self.known_ids = known_ids
+        self.known_run = known_run
+        self.consecutive_known = 0  # 连续已知论文计数器
+        self.stopped = False
+        self._outcomes = {}  # 已完成但尚未按顺序检查的页面: {页码: 论文列表，失败时为None}
+
+    def observe_known(self, page_results):
+        """按顺序统计连续出现的已知论文，达到known_run篇时停止，返回是否应停止爬取"""
+        if self.known_ids is None:
+            return False
+        for paper in page_results:
+            if paper.get("id") in self.known_ids:
+                self.consecutive_known += 1
+                if self.consecutive_known >= self.known_run:
+                    logger.info("连续遇到%d篇已爬取过的论文，后面的结果都已爬取，停止翻页", self.known_run)
+                    self.stopped = True
+                    break
+            else:
+                self.consecutive_known = 0
+        return self.stopped
+
+    def record(self, page, page_results):
+        """记录一页的结果，失败的页面传入None且不计入空页，返回是否应停止爬取"""
+        self._outcomes[page] = page_results
+        while not self.stopped and self.next_to_check in self._outcomes:
+            page_results = self._outcomes.pop(self.next_to_check)
+            if page_results is not None:
+                if not page_results:
+                    self.consecutive_empty += 1
+                    logger.info("第%d页没有数据 (连续空页: %d/%d)", self.next_to_check, self.consecutive_empty,
+                                self.max_consecutive_empty)
+                    if self.consecutive_empty >= self.max_consecutive_empty:
+                        logger.info("连续%d页没有数据，停止爬取", self.max_consecutive_empty)
+                        self.stopped = True
+                else:
+                    self.consecutive_empty = 0  # 重置计数器
+                    self.observe_known(page_results)
+            self.next_to_check += 1
+        return self.stopped
+
+
+def crawl_result_pages(keyword, pages, save_results, tracker, incremental=False):
+    """在LISTING_WINDOW大小的窗口内并发获取结果页
+
+    结果按完成顺序立即交给save_results(页码, 论文列表)保存，是否停止由tracker按页码顺序判断。
+    窗口只会超前于已检查的页码LISTING_WINDOW页，停止时最多多请求这么多页。
+    """
+    pages = list(pages)
+    if not pages:
+        return
+    next_index = 0  # 下一个要提交的页面
+    in_flight = {}
 
-        if not page_results:
-            consecutive_empty += 1
-            print(f"第{page}页没有数据 (连续空页: {consecutive_empty}/{max_consecutive_empty})")
-            if consecutive_empty >= max_consecutive_empty:
-                print(f"连续{max_consecutive_empty}页没有数据，停止爬取")
+    fetch_pool = ThreadPoolExecutor(max_workers=LISTING_WINDOW)
+    try:
+        while not tracker.stopped:
+            while (next_index < len(pages) and len(in_flight) < LISTING_WINDOW
+                   and pages[next_index] < tracker.next_to_check + LISTING_WINDOW):
+                page = pages[next_index]
+                in_flight[fetch_pool.submit(fetch_result_page, keyword, page, incremental)] = page
+                next_index += 1
+            if not in_flight:
                 break
-        else:
-            consecutive_empty = 0  # 重置计数器
-
-        save_page_results(keyword, page, page_results)
 
-        # 添加随机延迟避免被封
-        delay = 2 + random.random() * 3  # 2-5秒随机延迟
-        print(f"等待 {delay:.1f} 秒后继续...")
-        time.sleep(delay)
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = in_flight.pop(future)
+                page_results, error = future.result()
+                if error:
+                    logger.error("%s", error)
+                    if "验证" in error:
+                        logger.error("遇到验证页面，暂停爬取")
+                        tracker.stopped = True
+                    tracker.record(page, None)
+                    continue
+
+                # 结果页可以乱序保存
+                save_results(page, page_results)
+                tracker.record(page, page_results)
+    finally:
+        # 停止时取消尚未开始的请求
+        fetch_pool.shutdown(wait=True, cancel_futures=True)
 
 
 def main():
-    # 示例关键词
-    keyword = "Protein Biochemistry"
-
-    # 设置起始页
-    start_page = 2  # 可以修改为任意起始页码
-
-    # 搜索论文
-    search_proquest_papers(keyword, start_page)
+    parser = argparse.ArgumentParser(description="爬取ProQuest结果页中的论文ID")
+    parser.add_argument("keyword", nargs="?", default="Protein Biochemistry", help="要爬取的关键词")
+    parser.add_argument("--start-page", type=int, default=None,
+                        help="起始页码，默认为2（增量模式默认为1）")
+    parser.add_argument("--incremental", action="store_true", help="增量模式：只保存新出现的论文，遇到已爬取过的论文后停止翻页")
+    parser.add_argument("--restart", action="store_true", help="忽略上次的结果页进度，重新爬取全部结果页")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    # 按.env配置导出指标（HTTP端点或JSON快照），只在入口处启动，解析子进程导入本模块时不会启动
+    init_metrics()
+
+    # 设置起始页，增量模式从最新的结果开始
+    start_page = args.start_page or (1 if args.incremental else 2)
+
+    # 搜索论文，--profile时统计请求、解析、保存各阶段的耗时
+    stages = {"make_proquest_request": "fetch", "parse_result_page": "parse", "extract_paper_data": "parse",
+              "save_page_results": "persist"}
+    with profile_run(args, lambda: [(sys.modules[__name__], stages), (get_archive(), {"put": "archive"})]):
+        search_proquest_papers(args.keyword, start_page, incremental=args.incremental, resume=not args.restart)
 
 
 if __name__ == "__main__":
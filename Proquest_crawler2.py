@@ -1,18 +1,49 @@
 import os
+import sys
 import json
 import time
-import random
-import requests
 import re
-from bs4 import BeautifulSoup
-from utils import init_env, set_cookie, update_cookie
+import argparse
+from utils import init_env
+from log import get_logger
+from metrics import init_metrics
+from profiling import add_profile_arguments, profile_run
+from parsers import make_soup
+from http_client import get_client
+from rate_limiter import get_rate_limiter
+from storage import init_details_store
+from doc_store import get_document_store, SHARED_HITS
+from state_db import get_crawl_state
+from archive import get_archive, document_key
+from pipeline import DetailPipeline
+from retry import (RetryableError, init_retry_policy, classify_status, parse_retry_after,
+                   NETWORK, THROTTLED, SERVER_ERROR, FORBIDDEN)
 from urllib.parse import urljoin
 
 # 初始化环境变量
 HEADERS, MAX_RETRY_COUNT, MAX_WORKERS, MAX_CONCURRENT_REQUESTS = init_env()
 
-# 创建保存数据的目录
-os.makedirs("data/data_details", exist_ok=True)
+logger = get_logger("crawler2")
+
+# 两个爬虫阶段共用的HTTP客户端（连接池、Cookie）
+CLIENT = get_client(HEADERS)
+
+# 两个爬虫共用的限速器，替代固定的随机等待
+LIMITER = get_rate_limiter()
+
+# 重试策略：指数退避，按错误类别限制重试次数
+RETRY_POLICY = init_retry_policy(MAX_RETRY_COUNT)
+
+# 各关键词的详情文件，页面完成后由共享详情存储生成，可导出为旧的JSON格式
+STORE = init_details_store()
+
+EXPORT_JSON = os.getenv('DETAILS_EXPORT_JSON', '1').lower() not in ('0', 'false', 'no')
+
+# 爬取状态数据库（get_crawl_state）、调试HTML归档（get_archive）和所有关键词共享的论文详情（get_document_store）
+# 在第一次使用时才打开
+
+# 流水线各阶段之间队列的最大长度
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 32))
 
 # 关键词用于创建文件夹
 KEYWORD = "Protein Biochemistry"
@@ -26,54 +57,141 @@ crawling_status = {
 }
 
 # 正确的ProQuest基础URL
-PROQUEST_BASE_URL = "https://www.proquest.com"
+PROQUEST_BASE_URL = os.getenv('PROQUEST_BASE_URL', "https://www.proquest.com").rstrip('/')
+
 
+def is_complete_detail_page(html_content):
+    """详情页是否包含论文标题，只有完整的页面才写入HTTP缓存"""
+    return 'documentTitle' in html_content
 
-def make_detail_request(paper_id, retry_count=0):
-    """构造并发送论文详情页请求"""
-    if retry_count > MAX_RETRY_COUNT:
-        print(f"论文 {paper_id} 重试次数过多")
-        return None, "重试次数过多"
 
+def request_detail_page(paper_id):
+    """发送一次论文详情页请求，需要重试时抛出RetryableError"""
     # 正确构建URL - 使用urljoin确保URL格式正确
     url = urljoin(PROQUEST_BASE_URL, f"/docview/{paper_id}/abstract")
 
+    # 发送请求，其他关键词已获取过的详情页从HTTP缓存返回，不经过限速器，也不占用凭据
     try:
-        # 添加随机延迟，避免请求过于频繁
-        delay = random.uniform(1, 3)
-        time.sleep(delay)
+        response = CLIENT.get(url, limiter=LIMITER, cacheable=is_complete_detail_page)
+    except Exception as e:
+        raise RetryableError(NETWORK, f"请求论文 {paper_id} 详情页时出错: {str(e)}")
+    profile = response.profile
 
-        # 发送请求
-        response = requests.get(url, headers=HEADERS)
+    # 检查响应类型，出错的页面按采样策略保存到归档
+    error_kind = classify_status(response.status_code)
+    if response.status_code >= 400 or response.blocked:
+        get_archive().put(document_key(paper_id), response.text, kind="detail", error=True)
 
-        # 检查响应类型
-        if response.status_code == 403:
-            print("遇到极速禁止访问错误，可能需要更新Cookie")
-            HEADERS['Cookie'] = update_cookie()
-            return make_detail_request(paper_id, retry_count + 1)
+    if error_kind == FORBIDDEN:
+        logger.warning("遇到极速禁止访问错误，可能需要更新Cookie")
+        CLIENT.quarantine(profile, "遇到403错误")
+        raise RetryableError(FORBIDDEN, f"论文 {paper_id} 遇到403错误")
 
-        if response.status_code == 429:  # Too Many Requests
-            print("遇到429错误，请求过于频繁，等待一段时间后重试")
-            time.sleep(30)  # 等待30秒
-            return make_detail_request(paper_id, retry_count + 1)
+    # 验证页面在下载时已被识别，换一组凭据重试，不再当作空标题的页面解析
+    if response.blocked:
+        CLIENT.quarantine(profile, "遇到验证页面")
+        raise RetryableError(FORBIDDEN, f"论文 {paper_id} 遇到验证页面")
 
-        response.raise_for_status()
+    if error_kind == THROTTLED:  # Too Many Requests
+        retry_after = parse_retry_after(response)
+        LIMITER.on_throttle(retry_after)
+        raise RetryableError(THROTTLED, f"论文 {paper_id} 遇到429错误，请求过于频繁", retry_after)
 
-        # 更新Cookie
-        HEADERS['Cookie'] = set_cookie(response.headers, HEADERS['Cookie'])
+    if error_kind == SERVER_ERROR:
+        LIMITER.on_throttle(parse_retry_after(response))
+        raise RetryableError(SERVER_ERROR, f"论文 {paper_id} 服务器错误 {response.status_code}")
 
-        return response.text, None
+    if response.status_code >= 400:
+        logger.warning("论文 %s 请求失败: HTTP %s", paper_id, response.status_code)
+        return None, f"HTTP {response.status_code}"
 
-    except Exception as e:
-        print(f"\n请求论文详情页时出错: {str(e)}")
-        # 遇到错误时等待更长时间
-        time.sleep(10 + random.random())
-        return make_detail_request(paper_id, retry_count + 1)
+    if not getattr(response, 'from_cache', False):
+        LIMITER.on_success()
+        CLIENT.report_success(profile)
+    return response.text, None
+
+
+def make_detail_request(paper_id):
+    """构造并发送论文详情页请求，失败时按重试策略重试"""
+    return RETRY_POLICY.call(request_detail_page, paper_id)
+
+
+# 预编译的正则表达式
+DEGREE_LABEL_RE = re.compile(r'学位|degree', re.IGNORECASE)
+DOCVIEW_HREF_RE = re.compile(r'/docview/')
+DOC_ID_RE = re.compile(r'/docview/(\d+)/')
+COUNTRY_RE = re.compile(r'\b[A-Z][a-z]+(?: [A-Z][a-z]+)*\b')
+
+
+def keep_text(data_text):
+    return data_text
+
+
+def split_semicolon(data_text):
+    return [s.strip() for s in data_text.split(';') if s.strip()]
+
+
+def split_lines(data_text):
+    return [c.strip() for c in data_text.split('\n') if c.strip()]
+
+
+def split_location(data_text):
+    """把大学位置拆分为(国家, 城市)，无法确定的部分为None"""
+    for separator in ('--', '-'):
+        if separator in data_text:
+            country, city = data_text.split(separator, 1)
+            return country.strip(), city.strip()
+    # 如果没有分隔符，尝试匹配国家名称
+    country_match = COUNTRY_RE.search(data_text)
+    return (country_match.group(0) if country_match else None), None
+
+
+# 详情页索引行的字段映射表: (字段名匹配规则, 目标字段, 后处理函数)
+# 按顺序匹配，第一条匹配的规则生效；目标字段为元组时后处理函数返回对应的多个值
+INDEXING_FIELD_RULES = [
+    (re.compile(r'advisor|导师'), "advisor", keep_text),
+    (re.compile(r'(?=.*(?:university|大学))(?=.*(?:location|位置))'),
+     ("University location-country", "University location-city"), split_location),
+    (re.compile(r'university|大学'), "University/institute", keep_text),
+    (re.compile(r'department|部门'), "Department", keep_text),
+    (re.compile(r'publication year|出版年份'), "Publication Year", keep_text),
+    (re.compile(r'degree|^学位$'), "degree type", keep_text),
+    (re.compile(r'subject|主题'), "subject", split_semicolon),
+    (re.compile(r'classification|分类'), "Classification", split_lines),
+    (re.compile(r'keyword|关键字|标识符'), "Identifier / keyword", split_semicolon),
+    (re.compile(r'committee|委员会'), "Committee member", split_semicolon),
+]
+
+# 规范化字段名到规则的缓存，字段名种类很少，命中后只需一次字典查找
+_field_rule_cache = {}
+
+
+def resolve_indexing_field(field_name):
+    """查找字段名对应的规则，没有匹配的规则时返回None"""
+    label = field_name.strip().lower()
+    try:
+        return _field_rule_cache[label]
+    except KeyError:
+        rule = next((r for r in INDEXING_FIELD_RULES if r[0].search(label)), None)
+        _field_rule_cache[label] = rule
+        return rule
+
+
+def apply_field_rule(paper_data, rule, data_text):
+    """按规则处理字段值并写入paper_data"""
+    _, target, processor = rule
+    value = processor(data_text)
+    if isinstance(target, tuple):
+        for field, field_value in zip(target, value):
+            if field_value is not None:
+                paper_data[field] = field_value
+    else:
+        paper_data[target] = value
 
 
 def parse_detail_page(html_content, paper_id):
-    """解析论文详情页，提取关键信息"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+    """解析论文详情页，提取关键信息，也可以传入已解析的soup"""
+    soup = make_soup(html_content)
 
     # 初始化数据字典 - 移除了degree date和language字段
     paper_data = {
@@ -119,14 +237,14 @@ def parse_detail_page(html_content, paper_id):
                 paper_data["Abstract"] = abstract_text.get_text(strip=True)
 
         # 提取学位类型 - 根据第二张图片中的信息
-        degree_elem = soup.find('div', string=re.compile(r'学位|degree', re.IGNORECASE))
+        degree_elem = soup.find('div', string=DEGREE_LABEL_RE)
         if degree_elem:
             degree_text = degree_elem.find_next_sibling('div')
             if degree_text:
                 paper_data["degree type"] = degree_text.get_text(strip=True)
 
         # 提取文档URL - 根据第二张图片中的信息
-        doc_url_elem = soup.find('a', href=re.compile(r'/docview/'))
+        doc_url_elem = soup.find('a', href=DOCVIEW_HREF_RE)
         if doc_url_elem:
             paper_data["Document URL"] = urljoin(PROQUEST_BASE_URL, doc_url_elem['href'])
 
@@ -141,45 +259,10 @@ def parse_detail_page(html_content, paper_id):
                 field_name = field_name_elem.get_text(strip=True)
                 data_text = data_elem.get_text(strip=True, separator='\n')
 
-                # 更灵活的字段匹配
-                if "advisor" in field_name.lower() or "导师" in field_name:
-                    paper_data["advisor"] = data_text
-                elif "university" in field_name.lower() or "大学" in field_name:
-                    if "location" in field_name.lower() or "位置" in field_name:
-                        # 修改：提取国家信息和城市信息
-                        if '--' in data_text:
-                            parts = data_text.split('--', 1)
-                            paper_data["University location-country"] = parts[0].strip()
-                            if len(parts) > 1:
-                                paper_data["University location-city"] = parts[1].strip()
-                        elif '-' in data_text:
-                            parts = data_text.split('-', 1)
-                            paper_data["University location-country"] = parts[0].strip()
-                            if len(parts) > 1:
-                                paper_data["University location-city"] = parts[1].strip()
-                        else:
-                            # 如果没有分隔符，尝试匹配国家名称
-                            country_match = re.search(r'\b[A-Z][a-z]+(?: [A-Z][a-z]+)*\b', data_text)
-                            if country_match:
-                                paper_data["University location-country"] = country_match.group(0)
-                    else:
-                        paper_data["University/institute"] = data_text
-                elif "department" in field_name.lower() or "部门" in field_name:
-                    paper_data["Department"] = data_text
-                # 移除了language字段的处理
-                elif "publication year" in field_name.lower() or "出版年份" in field_name:
-                    paper_data["Publication Year"] = data_text
-                # 移除了degree date字段的处理
-                elif "degree" in field_name.lower() or "学位" == field_name:
-                    paper_data["degree type"] = data_text
-                elif "subject" in field_name.lower() or "主题" in field_name:
-                    paper_data["subject"] = [s.strip() for s in data_text.split(';') if s.strip()]
-                elif "classification" in field_name.lower() or "分类" in field_name:
-                    paper_data["Classification"] = [c.strip() for c in data_text.split('\n') if c.strip()]
-                elif "keyword" in field_name.lower() or "关键字" in field_name or "标识符" in field_name:
-                    paper_data["Identifier / keyword"] = [k.strip() for k in data_text.split(';') if k.strip()]
-                elif "committee" in field_name.lower() or "委员会" in field_name:
-                    paper_data["Committee member"] = [m.strip() for m in data_text.split(';') if m.strip()]
+                # 按规范化后的字段名查表，同一字段名只匹配一次
+                rule = resolve_indexing_field(field_name)
+                if rule:
+                    apply_field_rule(paper_data, rule, data_text)
 
         # 清理数据
         for key in paper_data:
@@ -192,38 +275,238 @@ def parse_detail_page(html_content, paper_id):
         # 重新抛出标题为空的异常
         raise e
     except Exception as e:
-        print(f"解析论文 {paper_id} 详情页时出错: {str(e)}")
+        logger.warning("解析论文 %s 详情页时出错: %s", paper_id, e)
         # 返回部分数据
         return paper_data
 
 
-def save_paper_details(details, keyword, page):
-    """保存论文详情到对应页面的JSON文件"""
-    # 创建关键词文件夹
-    keyword_dir = os.path.join("data/data_details", keyword.replace(' ', '_'))
-    os.makedirs(keyword_dir, exist_ok=True)
+def doc_id_from_details(details):
+    """从详情记录的Document URL中提取论文ID"""
+    doc_id_match = DOC_ID_RE.search(details.get("Document URL", ""))
+    return doc_id_match.group(1) if doc_id_match else None
+
+
+def save_paper_details(details, keyword, page, paper_id=None):
+    """保存论文详情到共享详情存储，该页的详情文件在页面完成后生成
+
+    每篇论文立即提交，进程被终止时已解析的论文不会丢失；状态数据库中的标记按STORE.batch_size批量更新，
+    尚未标记的论文下次运行时在共享详情存储中找到，不会重新请求。
+    """
+    paper_id = paper_id or doc_id_from_details(details)
+    store = get_document_store()
+    store.put(paper_id, details)
+    store.flush()
+    logger.debug("已保存论文 %s 的详情（关键词 '%s' 第 %d 页）", paper_id, keyword, page)
+    return True
+
+
+def fetch_detail_html(paper_id, keyword):
+    """获取详情页HTML并保存到调试归档，在请求线程池中执行
+
+    只发送一次请求，需要重试时抛出RetryableError，由流水线按退避时间重新提交，
+    避免等待重试的任务占用请求线程。
+    """
+    html_content, error = request_detail_page(paper_id)
+    if error:
+        return None, error
+    get_crawl_state().mark_fetched(paper_id)
+
+    # 保存HTML用于调试，压缩和写入在归档的后台线程中完成
+    get_archive().put(document_key(paper_id), html_content, kind="detail", keyword=keyword)
+
+    return html_content, None
 
-    # 创建文件名
-    filename = os.path.join(keyword_dir, f"{keyword.replace(' ', '_')}{page}.json")
 
-    # 如果文件已存在，则读取现有数据
-    existing_data = []
-    if os.path.exists(filename):
+def sync_saved_ids(keyword, page_num, saved_ids):
+    """把已保存的详情提交到共享详情存储后，再在状态数据库中批量标记为已保存"""
+    if not saved_ids:
+        return
+    get_document_store().flush()
+    get_crawl_state().mark_saved(keyword, page_num, saved_ids)
+    saved_ids.clear()
+
+
+def import_parsed_details(paper_ids):
+    """旧版本只把详情写在关键词的详情文件中，从记录的位置导入共享详情存储，返回导入的论文ID"""
+    sources = {}
+    for paper_id, location in get_crawl_state().parsed_locations(paper_ids).items():
+        sources.setdefault(location, []).append(paper_id)
+
+    imported = set()
+    for (source_keyword, source_page), ids in sources.items():
+        records = {doc_id_from_details(d): d for d in STORE.read_page(source_keyword, source_page)}
+        for paper_id in ids:
+            if paper_id in records:
+                get_document_store().put(paper_id, records[paper_id])
+                imported.add(paper_id)
+    get_document_store().flush()
+    return imported
+
+
+def use_shared_details(paper_ids, keyword, page_num):
+    """共享详情存储中已有的论文不再请求详情页，只登记为该页的论文，返回这些论文ID"""
+    shared = get_document_store().known_ids(paper_ids)
+    missing = [pid for pid in paper_ids if pid not in shared]
+    if missing:
+        shared |= import_parsed_details(missing)
+
+    if shared:
+        get_crawl_state().mark_saved(keyword, page_num, [pid for pid in paper_ids if pid in shared], parsed=False)
+        SHARED_HITS.inc(len(shared))
+        logger.info("第 %d 页有 %d 篇论文已在其他关键词中爬取，直接使用共享详情", page_num, len(shared))
+    return shared
+
+
+def materialize_page(keyword, page_num):
+    """由共享详情存储生成该页的详情文件（JSONL，EXPORT_JSON时同时导出JSON）"""
+    paper_ids = get_crawl_state().page_ids(keyword, page_num)
+    records = get_document_store().get_many(paper_ids)
+
+    # 旧版本爬取的论文只在详情文件中有记录，先导入共享详情存储，避免重写时丢失
+    missing = [pid for pid in paper_ids if pid not in records]
+    if missing:
+        existing = {doc_id_from_details(d): d for d in STORE.read_page(keyword, page_num)}
+        for paper_id in missing:
+            if paper_id in existing:
+                get_document_store().put(paper_id, existing[paper_id])
+                records[paper_id] = existing[paper_id]
+        get_document_store().flush()
+
+    if not records:
+        return
+    STORE.rewrite_page(keyword, page_num, [records[pid] for pid in paper_ids if pid in records])
+    if EXPORT_JSON:
+        STORE.finalize_page(keyword, page_num)
+
+
+def page_file_outdated(keyword, page_num, check_records=True):
+    """该页的详情文件是否需要重新生成
+
+    文件不存在时需要；check_records为True时还读取文件，与状态数据库中已保存的论文不一致（如上次在生成文件前中断）时也需要。
+    """
+    has_json = os.path.exists(STORE.page_path(keyword, page_num, ".json"))
+    if (EXPORT_JSON and not has_json) or (not has_json and not os.path.exists(STORE.page_path(keyword, page_num))):
+        return True
+    if not check_records:
+        return False
+    written = {doc_id_from_details(d) for d in STORE.read_page(keyword, page_num)}
+    return written != set(get_crawl_state().page_ids(keyword, page_num))
+
+
+def crawl_page_concurrently(paper_ids, keyword, page_num, total_papers):
+    """用流水线并发爬取一页论文详情
+
+    最多同时发出MAX_CONCURRENT_REQUESTS个请求，解析交给进程池（不超过MAX_WORKERS个进程），
+    保存统一在写入线程中完成，保证同一页面文件不会被并发写入。
+    """
+    saved_ids = []  # 已保存但尚未在状态数据库中标记的论文ID
+
+    def write_details(paper_id, detail_data):
+        # 保存论文详情到共享详情存储
+        save_paper_details(detail_data, keyword, page_num, paper_id)
+        saved_ids.append(paper_id)
+        if len(saved_ids) >= STORE.batch_size:
+            sync_saved_ids(keyword, page_num, saved_ids)
+
+        # 更新状态
+        crawling_status["crawled_count"] += 1
+        crawling_status["last_save_time"] = time.time()
+
+        # 显示进度 - 使用预先计算的总论文数，日志按模板限流，不会每篇论文输出一行
+        if total_papers > 0:
+            progress = (crawling_status["crawled_count"] / total_papers) * 100
+            logger.info("总进度: %.2f%% (%d/%d)", progress, crawling_status['crawled_count'], total_papers)
+        else:
+            logger.info("已爬取 %d 篇论文", crawling_status['crawled_count'])
+
+    def on_retry(paper_id, error, delay):
+        logger.warning("%s，%.1f 秒后重试", error, delay)
+        get_crawl_state().record_error(paper_id, error)
+
+    def on_failed(paper_id, error):
+        logger.error("获取论文 %s 详情失败: %s", paper_id, error)
+        get_crawl_state().mark_failed(paper_id, error)
+
+    pipeline = DetailPipeline(
+        fetch=lambda paper_id: fetch_detail_html(paper_id, keyword),
+        parse=parse_detail_page,
+        write=write_details,
+        retry_policy=RETRY_POLICY,
+        fetch_workers=MAX_CONCURRENT_REQUESTS,
+        parse_workers=MAX_WORKERS,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        on_retry=on_retry,
+        on_failed=on_failed,
+    )
+    try:
+        pipeline.run(paper_ids)
+    except ValueError as e:
+        # 捕获标题为空的异常并终止程序
+        raise Exception(f"爬取到空标题数据: {str(e)}")
+    finally:
+        sync_saved_ids(keyword, page_num, saved_ids)
+
+
+def prepare_page(keyword, page_num, paper_ids, saved_ids):
+    """登记一页的论文ID并过滤掉已保存的论文，返回 (需要爬取的论文ID, 使用共享详情的论文ID)"""
+    # 记录该页的论文ID，第一阶段已记录过的不会重复写入
+    get_crawl_state().register_ids(keyword, page_num, paper_ids)
+
+    # 状态数据库中没有记录但已有详情文件时（旧版本爬取的数据），扫描一次文件导入
+    if not saved_ids.intersection(paper_ids):
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
+            crawled = {doc_id_from_details(d): d for d in STORE.read_page(keyword, page_num)}
+            crawled.pop(None, None)
+            crawled_ids = list(crawled)
+            if crawled_ids:
+                for doc_id, details in crawled.items():
+                    get_document_store().put(doc_id, details)
+                get_document_store().flush()
+                get_crawl_state().mark_saved(keyword, page_num, crawled_ids)
+                saved_ids.update(crawled_ids)
         except Exception as e:
-            print(f"读取现有文件时出错: {str(e)}")
+            logger.warning("读取详情文件时出错: %s", e)
 
-    # 添加新数据
-    existing_data.append(details)
+    # 过滤掉已爬取的论文ID，其他关键词已爬取的论文直接使用共享详情
+    remaining_ids = [pid for pid in paper_ids if pid not in saved_ids]
+    shared_ids = set()
+    if remaining_ids:
+        shared_ids = use_shared_details(remaining_ids, keyword, page_num)
+        saved_ids.update(shared_ids)
+        remaining_ids = [pid for pid in remaining_ids if pid not in shared_ids]
+    return remaining_ids, shared_ids
 
-    # 保存为极速
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(existing_data, f, ensure_ascii=False, indent=2)
 
-    print(f"已保存论文详情到 {filename}")
-    return True
+def crawl_page(keyword, page_num, paper_ids, saved_ids, total_papers=0):
+    """爬取一页论文的详情，saved_ids为该关键词已保存的论文ID集合，会随爬取更新
+
+    返回该页的论文是否已全部保存；有论文失败时返回False，页码进度不应越过这一页。
+    """
+    remaining_ids, shared_ids = prepare_page(keyword, page_num, paper_ids, saved_ids)
+
+    if not remaining_ids:
+        logger.info("第 %d 页的所有论文已爬取完成", page_num)
+        if shared_ids or page_file_outdated(keyword, page_num):
+            materialize_page(keyword, page_num)
+        crawling_status["current_page"] = page_num + 1
+        return True
+
+    logger.info("第 %d 页有 %d 篇论文，其中 %d 篇需要爬取", page_num, len(paper_ids), len(remaining_ids))
+
+    # 并发爬取该页的论文详情
+    try:
+        crawl_page_concurrently(remaining_ids, keyword, page_num, total_papers)
+    finally:
+        # 由共享详情存储生成该页的详情文件
+        materialize_page(keyword, page_num)
+
+    # 更新当前页码
+    crawling_status["current_page"] = page_num + 1
+    saved_ids.update(get_crawl_state().page_ids(keyword, page_num))
+    failed_count = sum(1 for pid in paper_ids if pid not in saved_ids)
+    if failed_count:
+        logger.warning("第 %d 页有 %d 篇论文未能爬取，下次运行时重试", page_num, failed_count)
+    return not failed_count
 
 
 def crawl_paper_details(keyword):
@@ -231,7 +514,7 @@ def crawl_paper_details(keyword):
     # 查找关键词对应的ID文件
     keyword_dir = os.path.join("data/data_id", keyword.replace(' ', '_'))
     if not os.path.exists(keyword_dir):
-        print(f"没有找到关键词 {keyword} 的ID文件")
+        logger.warning("没有找到关键词 %s 的ID文件", keyword)
         return
 
     # 按页码排序极速
@@ -241,139 +524,77 @@ def crawl_paper_details(keyword):
     )
 
     if not id_files:
-        print(f"没有找到关键词 {keyword} 的论文ID文件")
+        logger.warning("没有找到关键词 %s 的论文ID文件", keyword)
         return
 
-    # 从当前页码开始处理
+    # 从当前页码开始处理，上次运行记录的页码保存在状态数据库中
+    crawling_status["current_page"] = get_crawl_state().get_progress(keyword, "details") or 1
     current_page = crawling_status["current_page"]
 
-    # 预先计算总论文数 - 修复生成器表达式问题
-    total_papers = 0
-    for page_file in id_files:
-        filepath = os.path.join(keyword_dir, page_file)
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                total_papers += len(data)
-        except Exception as e:
-            print(f"读取文件 {filepath} 时出错: {str(e)}")
-
-    print(f"总共需要爬取 {total_papers} 篇论文")
+    # 已写入详情文件的论文ID，一次索引查询即可得到
+    saved_ids = get_crawl_state().saved_ids(keyword)
 
-    # 处理每一页
+    # 读取所有ID文件，同时计算总论文数，每个文件只读一次
+    pages = []
+    total_papers = 0
     for page_file in id_files:
-        # 提取页码
         page_match = re.search(r'\d+', page_file)
         if not page_match:
             continue
-
-        page_num = int(page_match.group())
-
-        # 跳过已处理的页面
-        if page_num < current_page:
-            continue
-
-        print(f"正在处理第 {page_num} 页")
-
-        # 读取该页的所有论文ID
         filepath = os.path.join(keyword_dir, page_file)
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
                 page_data = json.load(f)
-                paper_ids = [paper["id"] for paper in page_data if "id" in paper]
         except Exception as e:
-            print(f"读取文件 {filepath} 时出错: {str(e)}")
+            logger.warning("读取文件 %s 时出错: %s", filepath, e)
             continue
+        total_papers += len(page_data)
+        pages.append((int(page_match.group()), [paper["id"] for paper in page_data if "id" in paper]))
 
-        if not paper_ids:
-            print(f"第 {page_num} 页没有找到论文ID")
-            continue
+    logger.info("总共需要爬取 %d 篇论文", total_papers)
 
-        # 检查已爬取的论文，避免重复爬取
-        details_file = os.path.join("data/data_details", keyword.replace(' ', '_'),
-                                    f"{keyword.replace(' ', '_')}{page_num}.json")
-        crawled_ids = set()
-
-        if os.path.exists(details_file):
-            try:
-                with open(details_file, 'r', encoding='utf-8') as f:
-                    existing_details = json.load(f)
-                    for detail in existing_details:
-                        if "Document URL" in detail:
-                            doc_id_match = re.search(r'/docview/(\d+)/', detail["Document URL"])
-                            if doc_id_match:
-                                crawled_ids.add(doc_id_match.group(1))
-            except Exception as e:
-                print(f"读取详情文件时出错: {str(e)}")
-
-        # 过滤掉已爬取的论文ID
-        remaining_ids = [pid for pid in paper_ids if pid not in crawled_ids]
-
-        if not remaining_ids:
-            print(f"第 {page_num} 页的所有论文已爬取完成")
-            crawling_status["current_page"] = page_num + 1
+    # 处理每一页，进度只推进到连续完成的最后一页，之前有失败论文的页面下次运行时重新检查
+    contiguous = True
+    for page_num, paper_ids in pages:
+        # 跳过已处理的页面，详情文件被删除时由共享详情存储重新生成
+        if page_num < current_page:
+            if paper_ids and page_file_outdated(keyword, page_num, check_records=False):
+                materialize_page(keyword, page_num)
             continue
 
-        print(f"第 {page_num} 页有 {len(paper_ids)} 篇论文，其中 {len(remaining_ids)} 篇需要爬取")
-
-        # 爬取该页的论文详情
-        for i, paper_id in enumerate(remaining_ids):
-            print(f"正在爬取第 {page_num} 页的第 {i + 1}/{len(remaining_ids)} 篇论文 (ID: {paper_id})")
-
-            # 获取详情页HTML
-            html_content, error = make_detail_request(paper_id)
-            if error:
-                print(f"获取论文 {paper_id} 详情失败: {error}")
-                continue
-
-            # 保存HTML用于调试
-            debug_dir = os.path.join("debug_html", keyword.replace(' ', '_'))
-            os.makedirs(debug_dir, exist_ok=True)
-            debug_path = os.path.join(debug_dir, f"{paper_id}.html")
-            with open(debug_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-
-            # 解析详情页
-            try:
-                detail_data = parse_detail_page(html_content, paper_id)
-            except ValueError as e:
-                # 捕获标题为空的异常并终止程序
-                raise Exception(f"爬取到空标题数据: {str(e)}")
-
-            # 立即保存论文详情到对应页面文件
-            save_paper_details(detail_data, keyword, page_num)
-
-            # 更新状态
-            crawling_status["crawled_count"] += 1
-            crawling_status["last_save_time"] = time.time()
-
-            # 显示进度 - 使用预先计算的总论文数
-            if total_papers > 0:
-                progress = (crawling_status["crawled_count"] / total_papers) * 100
-                print(f"总进度: {progress:.2f}% ({crawling_status['crawled_count']}/{total_papers})")
-            else:
-                print(f"已爬取 {crawling_status['crawled_count']} 极论文")
-
-            # 添加随机延迟，避免请求过于频繁
-            delay = random.uniform(2, 5)
-            time.sleep(delay)
-
-        # 更新当前页码 - 移动到循环外部
-        crawling_status["current_page"] = page_num + 1
+        logger.info("正在处理第 %d 页", page_num)
+
+        if not paper_ids:
+            logger.warning("第 %d 页没有找到论文ID", page_num)
+        elif not crawl_page(keyword, page_num, paper_ids, saved_ids, total_papers):
+            contiguous = False
+
+        if contiguous:
+            get_crawl_state().set_progress(keyword, "details", page_num + 1)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="爬取论文详情")
+    parser.add_argument("keyword", nargs="?", default=KEYWORD, help="要爬取详情的关键词，需要先完成结果页爬取")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    # 按.env配置导出指标（HTTP端点或JSON快照），只在入口处启动，解析子进程导入本模块时不会启动
+    init_metrics()
+
+    # --profile时统计请求、解析、保存各阶段的耗时
+    stages = {"make_detail_request": "fetch", "fetch_detail_html": "fetch", "parse_detail_page": "parse",
+              "save_paper_details": "persist", "sync_saved_ids": "persist"}
     try:
         # 爬取论文详情
-        crawl_paper_details(KEYWORD)
-        print("\n爬取完成！所有论文详情已保存")
+        with profile_run(args, lambda: [(sys.modules[__name__], stages), (get_archive(), {"put": "archive"})]):
+            crawl_paper_details(args.keyword)
+        logger.info("爬取完成！所有论文详情已保存")
 
     except KeyboardInterrupt:
-        print("\n用户中断爬取过程")
-        print(f"已保存部分数据 ({crawling_status['crawled_count']} 篇论文详情)")
+        logger.warning("用户中断爬取过程，已保存部分数据 (%d 篇论文详情)", crawling_status['crawled_count'])
     except Exception as e:
-        print(f"\n爬取过程中出现错误: {str(e)}")
-        print(f"已保存部分数据({crawling_status['crawled_count']}篇论文详情)")
+        logger.error("爬取过程中出现错误: %s，已保存部分数据 (%d 篇论文详情)", e, crawling_status['crawled_count'])
         # 重新抛出异常以确保程序终止
         raise
 
@@ -0,0 +1,248 @@
+import os
+import re
+import gzip
+import time
+import queue
+import atexit
+import sqlite3
+import hashlib
+import threading
+from log import get_logger
+from profiling import span
+
+# 安装了zstandard时使用zstd压缩，否则使用gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = get_logger("archive")
+
+# 采样策略
+MODE_OFF = "off"  # 不保存
+MODE_ERRORS = "errors"  # 只保存出错的页面
+MODE_SAMPLE = "sample"  # 每N个页面保存一个，出错的页面总是保存
+MODE_ALL = "all"  # 全部保存
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    kind TEXT,
+    keyword TEXT,
+    page INTEGER,
+    error INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL,
+    archived_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pages_keyword ON pages(keyword, kind);
+"""
+
+_STOP = object()
+
+
+def document_key(paper_id):
+    """详情页在归档中的键"""
+    return f"doc:{paper_id}"
+
+
+def results_key(keyword, page):
+    """结果页在归档中的键"""
+    return f"results:{keyword.replace(' ', '_')}:{page}"
+
+
+def delta_results_key(keyword, page):
+    """增量模式获取的结果页在归档中的键，与完整爬取的结果页分开，不覆盖已保存页面对应的HTML"""
+    return f"delta:{keyword.replace(' ', '_')}:{page}"
+
+
+class HtmlArchive:
+    """压缩的、按内容寻址的HTML归档
+
+    每个页面按内容的SHA-256保存为 objects/<前两位>/<sha256>.<压缩格式>，内容相同的页面只保存一份；
+    index.db 记录键到内容的映射，可以按论文ID随机读取。压缩和写入在后台线程中完成，不占用请求线程。
+    """
+
+    def __init__(self, root="debug_html/archive", mode=MODE_ALL, every_n=10, queue_size=256):
+        self.root = root
+        self.mode = mode
+        self.every_n = max(1, every_n)
+        self.codec = "zst" if zstandard is not None else "gz"
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._pending = {}
+        self._queue = queue.Queue(queue_size)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def should_archive(self, error=False):
+        """按采样策略判断是否保存该页面"""
+        if self.mode == MODE_OFF:
+            return False
+        if self.mode == MODE_ALL or error:
+            return True
+        if self.mode == MODE_SAMPLE:
+            with self._lock:
+                self._counter += 1
+                return (self._counter - 1) % self.every_n == 0
+        return False
+
+    def put(self, key, html_content, kind=None, keyword=None, page=None, error=False):
+        """把页面交给后台线程保存，未被采样时直接忽略"""
+        if not html_content or not self.should_archive(error):
+            return False
+        with self._lock:
+            self._pending[key] = html_content
+        self._queue.put((key, html_content, kind, keyword, page, error))
+        return True
+
+    def _object_path(self, sha256, codec):
+        return os.path.join(self.root, "objects", sha256[:2], f"{sha256}.{codec}")
+
+    def _compress(self, data):
+        if self.codec == "zst":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def _write_loop(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            # 一次取出队列中已有的页面，批量提交索引
+            while len(batch) < 64:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    self._queue.put(_STOP)
+                    break
+                batch.append(entry)
+            try:
+                with span("archive_write"):
+                    self._write_batch(batch)
+            except Exception as e:
+                logger.error("保存HTML归档时出错: %s", e)
+
+    def _write_batch(self, batch):
+        rows = []
+        for key, html_content, kind, keyword, page, error in batch:
+            data = html_content.encode('utf-8')
+            sha256 = hashlib.sha256(data).hexdigest()
+            path = self._object_path(sha256, self.codec)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(self._compress(data))
+                os.replace(tmp_path, path)
+            rows.append((key, sha256, self.codec, kind, keyword, page, int(error), len(data), time.time()))
+
+        with self._lock:
+            with self._conn:
+                # 出错的页面不覆盖同一个键下已保存的正常页面
+                self._conn.executemany(
+                    "INSERT INTO pages (key, sha256, codec, kind, keyword, page, error, size, archived_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                    "sha256 = excluded.sha256, codec = excluded.codec, kind = excluded.kind, "
+                    "keyword = COALESCE(excluded.keyword, keyword), page = excluded.page, "
+                    "error = excluded.error, size = excluded.size, archived_at = excluded.archived_at "
+                    "WHERE excluded.error = 0 OR error = 1", rows)
+            for key, html_content, *_ in batch:
+                if self._pending.get(key) is html_content:
+                    del self._pending[key]
+
+    def get(self, key):
+        """按键读取页面HTML，不存在时返回None"""
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            row = self._conn.execute("SELECT sha256, codec FROM pages WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        sha256, codec = row
+        with open(self._object_path(sha256, codec), 'rb') as f:
+            data = f.read()
+        if codec == "zst":
+            if zstandard is None:
+                raise RuntimeError("读取zstd压缩的归档需要安装zstandard")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            data = gzip.decompress(data)
+        return data.decode('utf-8')
+
+    def get_document(self, paper_id):
+        """按论文ID读取详情页HTML"""
+        return self.get(document_key(paper_id))
+
+    def keys(self, keyword=None, kind=None):
+        """列出归档中正常（非出错）的页面: [(键, 类型, 关键词, 页码)]"""
+        sql = "SELECT key, kind, keyword, page FROM pages WHERE error = 0"
+        params = []
+        if keyword is not None:
+            sql += " AND keyword = ?"
+            params.append(keyword)
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY key", params).fetchall()
+
+    def close(self):
+        """等待后台线程写完队列中的页面"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """获取共享的HTML归档，采样策略通过DEBUG_HTML_MODE和DEBUG_HTML_EVERY_N配置"""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = HtmlArchive(
+                root=os.getenv('DEBUG_HTML_ARCHIVE', 'debug_html/archive'),
+                mode=os.getenv('DEBUG_HTML_MODE', MODE_ALL).lower(),
+                every_n=int(os.getenv('DEBUG_HTML_EVERY_N', 10)),
+            )
+            atexit.register(_archive.close)
+        return _archive
+
+
+def load_fixtures(root="debug_html"):
+    """读取debug_html中保存的页面，包括压缩归档和旧版本保存的HTML文件"""
+    results_pages, detail_pages = [], []
+
+    archive_root = os.path.join(root, "archive")
+    if os.path.exists(os.path.join(archive_root, "index.db")):
+        archive = HtmlArchive(archive_root)
+        for key, kind, _, _ in archive.keys():
+            if kind == "results":
+                results_pages.append(archive.get(key))
+            else:
+                detail_pages.append((key.split(':', 1)[1], archive.get(key)))
+        archive.close()
+
+    # 旧版本直接保存的HTML文件，按文件名区分结果页和详情页
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.endswith('.html'):
+                continue
+            with open(os.path.join(dirpath, filename), 'r', encoding='utf-8') as f:
+                html_content = f.read()
+            if re.search(r'_page_\d+\.html$', filename):
+                results_pages.append(html_content)
+            else:
+                detail_pages.append((os.path.splitext(filename)[0], html_content))
+    return results_pages, detail_pages
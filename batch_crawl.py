@@ -0,0 +1,364 @@
+import json
+import argparse
+import threading
+from math import ceil
+from Proquest_crawler1 import (request_proquest_page, parse_result_page, save_page_results, ListingStopTracker,
+                               ListingProgress,
+                               RESULT_SETS, PER_PAGE, PAGES_RATIO, MAX_LISTING_PAGES, LISTING_WINDOW,
+                               MAX_CONCURRENT_REQUESTS, MAX_WORKERS)
+from Proquest_crawler2 import (fetch_detail_html, parse_detail_page, save_paper_details, prepare_page,
+                               sync_saved_ids, materialize_page, page_file_outdated, crawling_status, STORE,
+                               RETRY_POLICY)
+from reparse import list_id_pages
+from state_db import get_crawl_state
+from doc_store import get_document_store
+from pipeline import parse_in_pool
+from scheduler import FairScheduler
+from retry import RetryableError, RetryState
+from log import get_logger
+from metrics import init_metrics
+
+logger = get_logger("batch_crawl")
+
+# 同一关键词内结果页任务先于详情页任务执行，尽早发现新的论文ID
+LISTING = 0
+DETAIL = 1
+
+
+class KeywordJob:
+    """批量爬取中一个关键词的进度"""
+
+    def __init__(self, keyword, priority=1, result_set_id=None, start_page=1):
+        self.keyword = keyword
+        self.priority = priority
+        self.result_set_id = result_set_id
+        self.start_page = start_page
+        self.end_page = None  # 获取第一页后才知道
+        self.next_page = start_page + 1  # 下一个要加入队列的结果页
+        self.tracker = ListingStopTracker(start_page + 1)
+        self.progress = None  # 连续保存到的结果页，开始时从状态数据库恢复
+        self.listing_done = False
+        self.blocked = False  # 遇到验证页面，下次运行时重新爬取结果页
+        self.saved_ids = set()
+        self.queued_ids = set()
+        self.remaining = {}  # 页码 -> 尚未完成的详情任务数
+        self.unsynced = {}  # 页码 -> 已保存但尚未在状态数据库中标记的论文ID
+        self.materializing = {}  # 页码 -> 正在生成详情文件期间是否又需要重新生成
+
+
+def parse_keyword_line(line):
+    """解析一行关键词配置: 关键词 | 优先级 | 结果集ID，后两项可以省略"""
+    fields = [field.strip() for field in line.split('|')]
+    if not fields[0]:
+        return None
+    priority = float(fields[1]) if len(fields) > 1 and fields[1] else 1
+    result_set_id = fields[2] if len(fields) > 2 and fields[2] else None
+    return KeywordJob(fields[0], priority, result_set_id)
+
+
+def load_keywords(path):
+    """读取关键词列表文件，每行一个关键词，#开头的行为注释"""
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            job = parse_keyword_line(line)
+            if job:
+                jobs.append(job)
+    return jobs
+
+
+class BatchCrawler:
+    """在一个进程中爬取多个关键词
+
+    所有关键词的结果页和详情页请求放入同一个工作队列，由固定数量的工作线程执行，
+    请求速率仍由共享的限速器控制；工作队列按优先级在关键词之间公平分配请求。
+    结果页和详情保存的位置与单关键词爬取相同，重新运行同样的命令即可续爬。
+    self._lock只保护内存中的进度，文件和数据库的读写都在锁外进行。
+    """
+
+    def __init__(self, jobs, workers=MAX_CONCURRENT_REQUESTS):
+        self.jobs = {job.keyword: job for job in jobs}
+        self.workers = workers
+        self.scheduler = FairScheduler()
+        self._lock = threading.Lock()
+        self._retry_states = {}
+        self._error = None
+
+    def run(self):
+        """爬取所有关键词，出现致命错误时在清理后重新抛出"""
+        for job in self.jobs.values():
+            if job.result_set_id:
+                RESULT_SETS[job.keyword] = job.result_set_id
+            self.scheduler.add_key(job.keyword, job.priority)
+            self._start(job)
+
+        threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except BaseException as e:
+            self._fail(e)
+            for thread in threads:
+                thread.join()
+        finally:
+            with self._lock:
+                for job in self.jobs.values():
+                    for page, saved_ids in job.unsynced.items():
+                        sync_saved_ids(job.keyword, page, saved_ids)
+            get_document_store().flush()
+
+        if self._error is not None:
+            raise self._error
+        for job in self.jobs.values():
+            pending = sum(job.remaining.values())
+            if pending:
+                logger.warning("关键词 '%s' 完成，未能爬取的论文 %d 篇", job.keyword, pending)
+            else:
+                logger.info("关键词 '%s' 完成", job.keyword)
+
+    def _start(self, job):
+        """恢复已保存的结果页，并加入第一个任务"""
+        job.saved_ids = get_crawl_state().saved_ids(job.keyword)
+        # 上次连续保存的结果页不再请求，起始页仍然请求，用于获取总结果数
+        job.progress = ListingProgress(job.keyword, job.start_page, resume=True)
+        job.next_page = max(job.start_page + 1, job.progress.last_saved + 1)
+        job.tracker = ListingStopTracker(job.next_page)
+        for page, filepath in list_id_pages(job.keyword):
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    paper_ids = [paper["id"] for paper in json.load(f) if "id" in paper]
+            except Exception as e:
+                logger.warning("读取文件 %s 时出错: %s", filepath, e)
+                continue
+            self._add_details(job, page, paper_ids)
+
+        # 上次运行已完成结果页阶段的关键词只需要继续爬取详情
+        if get_crawl_state().get_progress(job.keyword, "batch_listing"):
+            job.listing_done = True
+        else:
+            self.scheduler.put(job.keyword, ("listing", job.start_page), order=LISTING)
+
+    def _fail(self, error):
+        """记录第一个致命错误并停止调度"""
+        if self._error is None:
+            self._error = error
+        self.scheduler.close()
+
+    def _work(self):
+        while True:
+            entry = self.scheduler.get()
+            if entry is None:
+                break
+            keyword, task = entry
+            try:
+                self._run_task(self.jobs[keyword], task)
+            except BaseException as e:
+                self._fail(e)
+            finally:
+                self.scheduler.task_done()
+
+    def _run_task(self, job, task):
+        key = (job.keyword, task)
+        try:
+            if task[0] == "listing":
+                self._run_listing(job, task[1])
+            else:
+                self._run_detail(job, task[1], task[2])
+        except RetryableError as e:
+            delay = RETRY_POLICY.next_delay(self._retry_states.setdefault(key, RetryState()), e)
+            if delay is not None:
+                logger.warning("%s，%.1f 秒后重试", e, delay)
+                if task[0] == "detail":
+                    get_crawl_state().record_error(task[2], str(e))
+                self.scheduler.put(job.keyword, task, order=LISTING if task[0] == "listing" else DETAIL, delay=delay)
+                return
+            # 不再重试的任务不需要保留重试状态
+            self._retry_states.pop(key, None)
+            if task[0] == "listing":
+                logger.error("获取关键词 '%s' 第 %d 页失败: %s，重试次数过多", job.keyword, task[1], e)
+                with self._lock:
+                    self._listing_failed(job, task[1])
+            else:
+                logger.error("获取论文 %s 详情失败: %s，重试次数过多", task[2], e)
+                get_crawl_state().mark_failed(task[2], f"{e}，重试次数过多")
+                self._detail_done(job, task[1])
+        else:
+            self._retry_states.pop(key, None)
+
+    def _run_listing(self, job, page):
+        """获取并解析一个结果页，把其中的论文ID加入详情任务"""
+        html_content, error = request_proquest_page(job.keyword, page)
+        total_results = 0
+        page_results = None
+        if not error:
+            total_results, page_results, error = parse_in_pool("results", MAX_WORKERS, parse_result_page, html_content)
+
+        with self._lock:
+            if error:
+                logger.error("关键词 '%s' 第 %d 页失败: %s", job.keyword, page, error)
+                if "验证" in error:
+                    logger.error("遇到验证页面，暂停关键词 '%s' 的结果页爬取", job.keyword)
+                    job.blocked = True
+                self._listing_failed(job, page)
+                return
+
+            if page == job.start_page:
+                if total_results == 0:
+                    logger.warning("关键词 '%s' 未找到任何结果", job.keyword)
+                    job.end_page = job.start_page
+                    self._finish_listing(job)
+                    return
+                # 与单关键词爬取相同的页数估计
+                pages_to_crawl = ceil(total_results / (PAGES_RATIO * PER_PAGE))
+                job.end_page = min(job.start_page + pages_to_crawl - 1, job.start_page + MAX_LISTING_PAGES)
+                logger.info("关键词 '%s' 总结果数: %d，计划爬取到第 %d 页", job.keyword, total_results, job.end_page)
+
+        # 续爬时起始页已在开始时从文件恢复
+        if page != job.start_page or page > job.progress.last_saved:
+            save_page_results(job.keyword, page, page_results)
+            job.progress.saved(page)
+            self._add_details(job, page, [paper["id"] for paper in page_results if "id" in paper])
+
+        with self._lock:
+            if page != job.start_page:
+                job.tracker.record(page, page_results)
+            self._schedule_listing(job)
+
+    def _listing_failed(self, job, page):
+        if page == job.start_page:
+            self._finish_listing(job)
+            return
+        job.tracker.record(page, None)
+        self._schedule_listing(job)
+
+    def _schedule_listing(self, job):
+        """在LISTING_WINDOW窗口内加入后续结果页，满足停止条件后丢弃剩余的结果页任务"""
+        if job.listing_done:
+            return
+        if job.tracker.stopped or job.blocked:
+            self.scheduler.drop(job.keyword, lambda task: task[0] == "listing")
+            self._finish_listing(job)
+            return
+        while job.next_page <= job.end_page and job.next_page < job.tracker.next_to_check + LISTING_WINDOW:
+            self.scheduler.put(job.keyword, ("listing", job.next_page), order=LISTING)
+            job.next_page += 1
+        if job.tracker.next_to_check > job.end_page:
+            self._finish_listing(job)
+
+    def _finish_listing(self, job):
+        if job.listing_done:
+            return
+        job.listing_done = True
+        # 第一页失败或遇到验证页面时不记录，下次运行重新爬取结果页
+        if not job.blocked and job.end_page is not None:
+            get_crawl_state().set_progress(job.keyword, "batch_listing", job.end_page)
+        logger.info("关键词 '%s' 的结果页爬取结束", job.keyword)
+
+    def _add_details(self, job, page, paper_ids):
+        """过滤已保存和已在队列中的论文，其余加入详情任务"""
+        with self._lock:
+            saved_ids = job.saved_ids.intersection(paper_ids)
+        remaining_ids, shared_ids = prepare_page(job.keyword, page, paper_ids, saved_ids)
+
+        with self._lock:
+            job.saved_ids.update(saved_ids)
+            remaining_ids = [pid for pid in remaining_ids if pid not in job.queued_ids]
+            for paper_id in remaining_ids:
+                job.queued_ids.add(paper_id)
+                self.scheduler.put(job.keyword, ("detail", page, paper_id), order=DETAIL)
+            if remaining_ids:
+                job.remaining[page] = job.remaining.get(page, 0) + len(remaining_ids)
+            idle = not job.remaining.get(page)
+
+        if idle and (shared_ids or page_file_outdated(job.keyword, page)):
+            self._materialize(job, page)
+
+    def _run_detail(self, job, page, paper_id):
+        """获取、解析并保存一篇论文的详情"""
+        html_content, error = fetch_detail_html(paper_id, job.keyword)
+        if error:
+            logger.error("获取论文 %s 详情失败: %s", paper_id, error)
+            get_crawl_state().mark_failed(paper_id, error)
+            self._detail_done(job, page)
+            return
+
+        try:
+            detail_data = parse_in_pool("detail", MAX_WORKERS, parse_detail_page, html_content, paper_id)
+        except ValueError as e:
+            # 标题为空说明登录状态已失效，停止整个批次
+            raise Exception(f"爬取到空标题数据: {str(e)}")
+
+        save_paper_details(detail_data, job.keyword, page, paper_id)
+        with self._lock:
+            job.saved_ids.add(paper_id)
+            saved_ids = job.unsynced.setdefault(page, [])
+            saved_ids.append(paper_id)
+            if len(saved_ids) >= STORE.batch_size:
+                del job.unsynced[page]
+            else:
+                saved_ids = None
+            crawling_status["crawled_count"] += 1
+        if saved_ids:
+            sync_saved_ids(job.keyword, page, saved_ids)
+        self._detail_done(job, page)
+
+    def _detail_done(self, job, page):
+        """一篇论文处理完毕，该页全部完成时由共享详情存储生成详情文件"""
+        with self._lock:
+            job.remaining[page] -= 1
+            if job.remaining[page] > 0:
+                return
+            del job.remaining[page]
+            saved_ids = job.unsynced.pop(page, [])
+        sync_saved_ids(job.keyword, page, saved_ids)
+        self._materialize(job, page)
+        logger.info("关键词 '%s' 第 %d 页的论文详情已爬取完成", job.keyword, page)
+
+    def _materialize(self, job, page):
+        """生成一页的详情文件，同一页不会被并发写入；生成期间又有请求时再生成一次"""
+        with self._lock:
+            if page in job.materializing:
+                job.materializing[page] = True
+                return
+            job.materializing[page] = False
+        while True:
+            try:
+                materialize_page(job.keyword, page)
+            except BaseException:
+                with self._lock:
+                    del job.materializing[page]
+                raise
+            with self._lock:
+                if not job.materializing[page]:
+                    del job.materializing[page]
+                    return
+                job.materializing[page] = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在一个进程中批量爬取多个关键词")
+    parser.add_argument("keywords", nargs="*", help="要爬取的关键词，格式: 关键词 | 优先级 | 结果集ID")
+    parser.add_argument("--file", help="关键词列表文件，每行一个关键词，格式同上")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_REQUESTS, help="同时执行的请求数")
+    args = parser.parse_args()
+    init_metrics()
+
+    jobs = load_keywords(args.file) if args.file else []
+    jobs += [job for job in map(parse_keyword_line, args.keywords) if job]
+    if not jobs:
+        parser.error("没有指定关键词")
+
+    try:
+        BatchCrawler(jobs, args.workers).run()
+        logger.info("批量爬取完成！")
+    except KeyboardInterrupt:
+        logger.warning("用户中断爬取过程，已保存部分数据 (%d 篇论文详情)", crawling_status['crawled_count'])
+
+
+if __name__ == "__main__":
+    main()
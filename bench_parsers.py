@@ -0,0 +1,53 @@
+import sys
+import time
+from parsers import AVAILABLE_PARSERS, make_soup
+from archive import load_fixtures
+from Proquest_crawler1 import extract_total_results, extract_paper_data, parse_result_page
+from Proquest_crawler2 import parse_detail_page
+
+
+def run_backend(parser, results_pages, detail_pages, rounds):
+    """用指定后端解析全部页面rounds次，返回总耗时"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html_content in results_pages:
+            soup = make_soup(html_content, parser)
+            extract_total_results(soup)
+            extract_paper_data(soup)
+        for paper_id, html_content in detail_pages:
+            try:
+                parse_detail_page(make_soup(html_content, parser), paper_id)
+            except ValueError:
+                pass
+    return time.perf_counter() - start
+
+
+def main():
+    root = sys.argv[1] if len(sys.argv) > 1 else "debug_html"
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    results_pages, detail_pages = load_fixtures(root)
+    total_pages = len(results_pages) + len(detail_pages)
+    if not total_pages:
+        print(f"{root} 中没有找到HTML文件")
+        return
+
+    print(f"结果页 {len(results_pages)} 个，详情页 {len(detail_pages)} 个，每个后端运行 {rounds} 轮")
+    baseline = None
+    for parser in reversed(AVAILABLE_PARSERS):
+        elapsed = run_backend(parser, results_pages, detail_pages, rounds)
+        per_page = elapsed / (total_pages * rounds) * 1000
+        baseline = baseline or elapsed
+        print(f"{parser:<12} 总耗时 {elapsed:.2f} 秒，平均每页 {per_page:.2f} 毫秒，加速比 {baseline / elapsed:.2f}x")
+
+    # 结果页的事件解析器不构建文档树，单独统计
+    if results_pages:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for html_content in results_pages:
+                parse_result_page(html_content)
+        per_page = (time.perf_counter() - start) / (len(results_pages) * rounds) * 1000
+        print(f"{'stream':<12} 结果页平均每页 {per_page:.2f} 毫秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import resource
+import argparse
+import shutil
+import tempfile
+import threading
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_mock_server(args):
+    """在子进程中启动模拟服务器，返回 (进程, 基础URL)"""
+    command = [sys.executable, os.path.join(REPO_DIR, "mock_server.py"), "--port", "0",
+               "--fixtures", args.fixtures, "--total", str(args.total),
+               "--latency", str(args.latency), "--jitter", str(args.jitter),
+               "--rate-429", str(args.rate_429), "--rate-403", str(args.rate_403),
+               "--rate-verify", str(args.rate_verify), "--seed", str(args.seed)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, cwd=REPO_DIR)
+    line = server.stdout.readline()
+    match = re.search(r'(http://[\d.]+:\d+)', line)
+    if not match:
+        server.kill()
+        raise RuntimeError(f"模拟服务器启动失败: {line.strip()}")
+    print(line.strip())
+    return server, match.group(1)
+
+
+def configure_env(base_url, args):
+    """指向模拟服务器的配置，已设置的环境变量优先"""
+    defaults = {
+        'PROQUEST_BASE_URL': base_url,
+        'VERIFY_HOSTS': 'localhost',
+        'COOKIE': 'session=benchmark',
+        'HTTP_CACHE_DIR': '',
+        'COOKIE_JAR_DIR': '',
+        'DEBUG_HTML_MODE': 'off',
+        'LOG_LEVEL': 'WARNING',
+        'DETAILS_FSYNC': '0',
+        # spawn启动的解析进程是本进程的子进程，才能统计到它们的CPU时间和内存
+        'PARSE_START_METHOD': 'spawn',
+        'MAX_CONCURRENT_REQUESTS': str(args.concurrency),
+        'RATE_LIMIT_RPS': str(args.rps),
+        'RATE_LIMIT_MAX_RPS': str(args.rps),
+        'RATE_LIMIT_BURST': str(args.concurrency),
+        # 每秒最多恢复目标速率的5%，注入429后可以在几十秒内回到目标速率
+        'RATE_LIMIT_INCREASE': str(args.rps / 20),
+        'RETRY_BASE_DELAY': '0.1',
+        'RETRY_MAX_DELAY': '2',
+        'PROFILE_QUARANTINE_SECONDS': '0.5',
+        'PROFILE_MAX_QUARANTINE_SECONDS': '2',
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+class RequestRecorder:
+    """记录每个HTTP请求的耗时和状态码，按阶段分组"""
+
+    def __init__(self):
+        self.stage = None
+        self.latencies = {}  # 阶段 -> [秒]
+        self.statuses = {}  # 阶段 -> {状态: 次数}
+        self._lock = threading.Lock()
+
+    def wrap(self, client):
+        send = client._send
+
+        def timed_send(*args, **kwargs):
+            start = time.perf_counter()
+            status = "error"
+            try:
+                response = send(*args, **kwargs)
+                status = response.blocked or str(response.status_code)
+                return response
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.latencies.setdefault(self.stage, []).append(elapsed)
+                    counts = self.statuses.setdefault(self.stage, {})
+                    counts[status] = counts.get(status, 0) + 1
+        client._send = timed_send
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def stage_report(recorder, stage, elapsed):
+    """一个阶段的统计: 成功获取的页面数、每秒页数、请求延迟的p50/p99（毫秒）"""
+    latencies = recorder.latencies.get(stage, [])
+    pages = recorder.statuses.get(stage, {}).get("200", 0)
+    return {
+        "pages": pages,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "statuses": recorder.statuses.get(stage, {}),
+    }
+
+
+def cpu_seconds(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_benchmark(keyword="Benchmark"):
+    """完整运行结果页和详情页两个阶段，返回统计结果"""
+    # 爬虫模块在导入时读取配置，必须在configure_env之后导入
+    import Proquest_crawler1 as crawler1
+    import Proquest_crawler2 as crawler2
+    import pipeline
+    from metrics import REGISTRY
+
+    recorder = RequestRecorder()
+    recorder.wrap(crawler1.CLIENT)
+
+    stages = {}
+    start_cpu = cpu_seconds(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+
+    for stage, crawl in (("listing", crawler1.search_proquest_papers), ("details", crawler2.crawl_paper_details)):
+        recorder.stage = stage
+        stage_start = time.perf_counter()
+        crawl(keyword)
+        stages[stage] = stage_report(recorder, stage, time.perf_counter() - stage_start)
+
+    wall = time.perf_counter() - start
+    # 解析进程退出后才能统计子进程的CPU时间和内存
+    if pipeline._parse_pool is not None:
+        pipeline._parse_pool.shutdown(wait=True)
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "stages": stages,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu_seconds(resource.RUSAGE_SELF) - start_cpu
+                             + children_usage.ru_utime + children_usage.ru_stime, 3),
+        # Linux上ru_maxrss的单位是KB
+        "peak_rss_mb": round(self_usage.ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(children_usage.ru_maxrss / 1024, 1),
+        # 解析、写入、限速等待等各环节的耗时分布
+        "metrics": REGISTRY.snapshot()["metrics"],
+    }
+
+
+def compare_with_baseline(result, baseline, tolerance):
+    """与基准结果比较，返回性能下降超过容忍比例的项目"""
+    regressions = []
+    for stage, stats in baseline.get("stages", {}).items():
+        current = result["stages"].get(stage)
+        if current is None:
+            continue
+        if current["pages_per_sec"] < stats["pages_per_sec"] * (1 - tolerance):
+            regressions.append(f"{stage} 每秒页数 {current['pages_per_sec']} < 基准 {stats['pages_per_sec']}")
+        if current["p99_ms"] > stats["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{stage} p99延迟 {current['p99_ms']}毫秒 > 基准 {stats['p99_ms']}毫秒")
+    return regressions
+
+
+def print_report(result):
+    for stage, stats in result["stages"].items():
+        print(f"{stage:<8} {stats['pages']} 页，{stats['requests']} 个请求，{stats['seconds']} 秒，"
+              f"每秒 {stats['pages_per_sec']} 页，p50 {stats['p50_ms']} 毫秒，p99 {stats['p99_ms']} 毫秒，"
+              f"状态 {stats['statuses']}")
+    print(f"总耗时 {result['wall_seconds']} 秒，CPU {result['cpu_seconds']} 秒，"
+          f"峰值内存 {result['peak_rss_mb']} MB（解析进程 {result['peak_child_rss_mb']} MB）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用本地模拟服务器端到端测试爬虫的吞吐量")
+    parser.add_argument("--fixtures", default=os.path.join(REPO_DIR, "debug_html"),
+                        help="模拟服务器使用的页面目录，设为空则生成页面")
+    parser.add_argument("--total", type=int, default=3200, help="模拟的总结果数")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务器的平均响应延迟秒数")
+    parser.add_argument("--jitter", type=float, default=0.02, help="延迟的随机波动秒数")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回429的比例")
+    parser.add_argument("--rate-403", type=float, default=0.0, help="返回403的比例")
+    parser.add_argument("--rate-verify", type=float, default=0.0, help="重定向到验证页面的比例")
+    parser.add_argument("--seed", type=int, default=1, help="故障注入的随机数种子")
+    parser.add_argument("--concurrency", type=int, default=5, help="MAX_CONCURRENT_REQUESTS")
+    parser.add_argument("--rps", type=float, default=200.0, help="限速器的每秒请求数")
+    parser.add_argument("--json", help="把结果保存到JSON文件")
+    parser.add_argument("--baseline", help="基准结果的JSON文件，性能下降超过容忍比例时返回非0")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的性能下降比例")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录以便检查爬取结果")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args)
+    atexit.register(server.kill)
+    configure_env(base_url, args)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    # 爬虫在当前目录下写入data和debug_html，在临时目录中运行，不影响真实数据，结束后删除
+    workdir = tempfile.mkdtemp(prefix="proquest_bench_")
+    os.chdir(workdir)
+    print(f"工作目录: {workdir}")
+
+    try:
+        result = run_benchmark()
+    finally:
+        server.kill()
+        server.wait()
+        os.chdir(REPO_DIR)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    result["config"] = {name: getattr(args, name) for name in
+                        ("total", "latency", "jitter", "rate_429", "rate_403", "rate_verify", "concurrency", "rps")}
+    print_report(result)
+
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(result, baseline, args.tolerance)
+        if regressions:
+            print("性能下降:\n" + "\n".join(regressions))
+            sys.exit(1)
+        print("与基准相比没有明显的性能下降")
+
+
+if __name__ == "__main__":
+    main()
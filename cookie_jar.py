@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from email.utils import parsedate_to_datetime
+
+
+def get_set_cookie_headers(headers):
+    """取出响应中的全部Set-Cookie头（可能是列表或字符串）"""
+    if 'Set-Cookie' not in headers:
+        return []
+    if hasattr(headers, 'getlist'):
+        return headers.getlist('Set-Cookie')
+    if hasattr(headers, 'get_list'):
+        return headers.get_list('Set-Cookie')
+    return [headers['Set-Cookie']]
+
+
+def parse_set_cookie(set_cookie_str, now=None):
+    """解析一个Set-Cookie头，返回 (名称, 值, 路径, 过期时间)，过期时间为None表示会话Cookie"""
+    parts = set_cookie_str.split(';')
+    if '=' not in parts[0]:
+        return None
+    name, value = parts[0].split('=', 1)
+    path, expires, max_age = "/", None, None
+    for attribute in parts[1:]:
+        key, _, attr_value = attribute.strip().partition('=')
+        key = key.lower()
+        if key == 'path' and attr_value.startswith('/'):
+            path = attr_value
+        elif key == 'max-age':
+            try:
+                max_age = int(attr_value)
+            except ValueError:
+                pass
+        elif key == 'expires':
+            try:
+                expires = parsedate_to_datetime(attr_value).timestamp()
+            except (TypeError, ValueError):
+                pass
+    # Max-Age优先于Expires
+    if max_age is not None:
+        expires = (now or time.time()) + max_age
+    return name.strip(), value.strip(), path, expires
+
+
+def cookie_fingerprint(cookie_header):
+    """Cookie字符串的指纹，用于判断保存的Cookie是否属于同一次登录"""
+    return hashlib.sha256((cookie_header or "").encode('utf-8')).hexdigest()[:16]
+
+
+class CookieJar:
+    """线程安全的Cookie存储
+
+    初始Cookie字符串只解析一次，之后每个响应只解析其中的Set-Cookie并增量更新；过期的Cookie自动删除。
+    请求头按路径缓存，Cookie没有变化且没有Cookie过期时直接返回缓存的字符串。
+    """
+
+    def __init__(self, cookie_header=None):
+        self._cookies = {}  # 名称 -> (值, 路径, 过期时间)
+        self._lock = threading.Lock()
+        self._headers = {}  # 路径 -> 缓存的Cookie请求头
+        self._next_expiry = None  # 最早的过期时间，到期后需要重新生成请求头
+        self.changed = False  # 上次保存后是否有变化
+        if cookie_header:
+            self.replace(cookie_header)
+
+    def replace(self, cookie_header):
+        """用一个Cookie字符串替换全部Cookie（例如凭据更新后）"""
+        cookies = {}
+        for pair in cookie_header.split(';'):
+            if '=' in pair:
+                name, value = pair.split('=', 1)
+                cookies[name.strip()] = (value.strip(), "/", None)
+        with self._lock:
+            self._cookies = cookies
+            self._invalidate()
+
+    def _invalidate(self):
+        self._headers.clear()
+        expiries = [expires for _, _, expires in self._cookies.values() if expires is not None]
+        self._next_expiry = min(expiries) if expiries else None
+        self.changed = True
+
+    def update(self, set_cookie_headers):
+        """根据响应中的Set-Cookie头增量更新，返回是否有变化"""
+        if not set_cookie_headers:
+            return False
+        now = time.time()
+        updated = False
+        with self._lock:
+            for set_cookie_str in set_cookie_headers:
+                parsed = parse_set_cookie(set_cookie_str, now)
+                if parsed is None:
+                    continue
+                name, value, path, expires = parsed
+                if expires is not None and expires <= now:
+                    # 服务器用过期时间删除Cookie
+                    updated |= self._cookies.pop(name, None) is not None
+                elif self._cookies.get(name) != (value, path, expires):
+                    self._cookies[name] = (value, path, expires)
+                    updated = True
+            if updated:
+                self._invalidate()
+        return updated
+
+    def update_from_headers(self, response_headers):
+        return self.update(get_set_cookie_headers(response_headers))
+
+    def header(self, path="/"):
+        """生成请求路径对应的Cookie请求头，只包含未过期且路径匹配的Cookie"""
+        with self._lock:
+            if self._next_expiry is not None and self._next_expiry <= time.time():
+                now = time.time()
+                self._cookies = {name: cookie for name, cookie in self._cookies.items()
+                                 if cookie[2] is None or cookie[2] > now}
+                self._invalidate()
+            cached = self._headers.get(path)
+            if cached is None:
+                cached = '; '.join(f"{name}={value}" for name, (value, cookie_path, _) in self._cookies.items()
+                                   if path.startswith(cookie_path))
+                self._headers[path] = cached
+            return cached
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cookies)
+
+    def save(self, path, fingerprint=None):
+        """原子地保存到JSON文件，fingerprint记录Cookie来自哪一次登录"""
+        with self._lock:
+            data = {"fingerprint": fingerprint, "saved_at": time.time(),
+                    "cookies": [[name, value, cookie_path, expires]
+                                for name, (value, cookie_path, expires) in self._cookies.items()]}
+            self.changed = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # 临时文件名包含进程和线程，同一文件的并发保存不会互相覆盖临时文件
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load(self, path, fingerprint=None):
+        """从JSON文件加载未过期的Cookie，文件来自另一次登录（指纹不同）时不加载，返回是否加载"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if fingerprint is not None and data.get("fingerprint") != fingerprint:
+            return False
+        now = time.time()
+        with self._lock:
+            self._cookies = {name: (value, cookie_path, expires) for name, value, cookie_path, expires in data["cookies"]
+                             if expires is None or expires > now}
+            self._invalidate()
+            self.changed = False
+        return True
@@ -0,0 +1,104 @@
+import queue
+import argparse
+import threading
+from Proquest_crawler1 import search_proquest_papers
+from Proquest_crawler2 import crawl_page, crawling_status
+from state_db import get_crawl_state
+from log import get_logger
+from metrics import init_metrics
+
+logger = get_logger("crawl_pipeline")
+
+# 结果页阶段结束标记
+_DONE = object()
+
+
+def _put(q, entry, stop):
+    """向有界队列放入数据，stop被设置后放弃并返回False"""
+    while not stop.is_set():
+        try:
+            q.put(entry, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def crawl_keyword_pipelined(keyword, start_page=1, queue_size=4, incremental=False):
+    """两个阶段同时进行：结果页每获取一页，论文ID立即交给详情阶段爬取
+
+    结果页仍然保存到 data/data_id，详情阶段按状态数据库跳过已保存的论文，中断后重新运行即可续爬。
+    详情进度与Proquest_crawler2相同，只推进到连续完成的最后一页，结果页乱序到达时等待前面的页面完成。
+    """
+    pages = queue.Queue(queue_size)
+    stop = threading.Event()
+    listing_errors = []
+
+    def on_page(page, results):
+        if not _put(pages, (page, [paper["id"] for paper in results if "id" in paper]), stop):
+            raise RuntimeError("详情阶段已停止，结束结果页爬取")
+
+    def run_listing():
+        try:
+            search_proquest_papers(keyword, start_page, on_page=on_page, incremental=incremental)
+        except BaseException as e:
+            if not stop.is_set():
+                listing_errors.append(e)
+        finally:
+            _put(pages, _DONE, stop)
+
+    listing_thread = threading.Thread(target=run_listing, daemon=True)
+    listing_thread.start()
+
+    # 已写入详情文件的论文ID，一次索引查询即可得到
+    saved_ids = get_crawl_state().saved_ids(keyword)
+    # 下一个未确认完成的页码，之前的页面都已爬取完成
+    next_page = get_crawl_state().get_progress(keyword, "details") or start_page
+    completed = set()
+    try:
+        while True:
+            entry = pages.get()
+            if entry is _DONE:
+                break
+            page, paper_ids = entry
+            if paper_ids:
+                logger.info("正在处理第 %d 页", page)
+                # 有论文失败的页面不计入完成，进度停在这一页之前
+                if not crawl_page(keyword, page, paper_ids, saved_ids):
+                    continue
+            if page < next_page:
+                continue
+            completed.add(page)
+            last_page = next_page
+            while next_page in completed:
+                completed.remove(next_page)
+                next_page += 1
+            if next_page != last_page:
+                get_crawl_state().set_progress(keyword, "details", next_page)
+    finally:
+        stop.set()
+        listing_thread.join()
+
+    if listing_errors:
+        raise listing_errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="结果页和详情页流水线爬取")
+    parser.add_argument("keyword", nargs="?", default="Protein Biochemistry", help="要爬取的关键词")
+    parser.add_argument("--start-page", type=int, default=None,
+                        help="结果页起始页码，与Proquest_crawler1相同，默认为2（增量模式默认为1）")
+    parser.add_argument("--incremental", action="store_true", help="增量模式：只爬取新出现的论文")
+    args = parser.parse_args()
+    init_metrics()
+
+    try:
+        start_page = args.start_page or (1 if args.incremental else 2)
+        crawl_keyword_pipelined(args.keyword, start_page, incremental=args.incremental)
+        logger.info("爬取完成！所有论文详情已保存")
+    except KeyboardInterrupt:
+        logger.warning("用户中断爬取过程，已保存部分数据 (%d 篇论文详情)", crawling_status['crawled_count'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import atexit
+import threading
+import subprocess
+from dotenv import load_dotenv
+from cookie_jar import CookieJar, cookie_fingerprint
+from log import get_logger
+
+logger = get_logger("credentials")
+
+
+class Profile:
+    """一组登录凭据：Cookie和User-Agent
+
+    cookie为配置中的Cookie字符串，实际发送的Cookie由jar维护；设置了jar_path时，
+    同一次登录（配置的Cookie没有变化）中服务器下发的Cookie会保存到磁盘，重启后继续使用。
+    """
+
+    def __init__(self, name, cookie, user_agent=None, jar_path=None, save_interval=30):
+        self.name = name
+        self.user_agent = user_agent
+        self.jar_path = jar_path
+        self.save_interval = save_interval
+        self.quarantined_until = 0.0  # 隔离结束的时间，0表示正常
+        self.failures = 0  # 连续被隔离的次数
+        self.refreshing = False
+        self._last_save = time.time()
+        self._save_lock = threading.Lock()  # 多个请求线程同时保存时只有一个写入文件
+        self.set_cookie(cookie, load_saved=True)
+
+    def set_cookie(self, cookie, load_saved=False):
+        """换成新的Cookie字符串，load_saved为True时优先使用同一次登录保存的Cookie"""
+        self.cookie = cookie
+        self.fingerprint = cookie_fingerprint(cookie)
+        self.jar = CookieJar(cookie)
+        if load_saved and self.jar_path and self.jar.load(self.jar_path, self.fingerprint):
+            logger.info("凭据 %s 使用上次保存的 %d 个Cookie", self.name, len(self.jar))
+
+    def healthy(self, now=None):
+        return self.quarantined_until <= (now or time.time())
+
+    def cookie_header(self, path="/"):
+        return self.jar.header(path)
+
+    def update_from_headers(self, response_headers):
+        """根据响应中的Set-Cookie更新本组凭据的Cookie，有变化时定期保存到磁盘"""
+        if self.jar.update_from_headers(response_headers):
+            self.save(self.save_interval)
+
+    def save(self, min_interval=0):
+        """Cookie有变化时保存到磁盘，距上次保存不足min_interval秒时跳过"""
+        if not self.jar_path:
+            return
+        with self._save_lock:
+            if not self.jar.changed or time.time() - self._last_save < min_interval:
+                return
+            self._last_save = time.time()
+            try:
+                self.jar.save(self.jar_path, self.fingerprint)
+            except OSError as e:
+                # 保留变化标记，下次再保存
+                self.jar.changed = True
+                logger.error("保存凭据 %s 的Cookie时出错: %s", self.name, e)
+
+
+def load_profiles(path=None, env_file=None):
+    """读取凭据配置: {名称: (Cookie, User-Agent)}
+
+    设置了COOKIE_PROFILES时从该JSON文件读取 [{"name", "cookie", "user_agent"}]，
+    否则重新加载env_file（默认.env）并使用其中的COOKIE。
+    """
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        return {entry.get("name") or f"profile{i + 1}": (entry["cookie"], entry.get("user_agent"))
+                for i, entry in enumerate(entries) if entry.get("cookie")}
+    load_dotenv(env_file, override=True)
+    return {"default": (os.getenv('COOKIE'), os.getenv('USER_AGENT'))}
+
+
+class CredentialPool:
+    """多组凭据轮流使用，遇到403或验证页面的凭据被隔离一段时间，其余凭据继续爬取
+
+    隔离期间不会阻塞爬虫：配置文件（COOKIE_PROFILES或.env）被修改后自动重新加载并解除对应凭据的隔离；
+    设置了refresh_command时在后台线程中运行该命令，命令输出的新Cookie会立即生效。
+    只有全部凭据都被隔离时，请求才会等待最早结束隔离或被更新的凭据。
+    """
+
+    def __init__(self, profiles, source=None, quarantine_seconds=600, max_quarantine=3600,
+                 refresh_command=None, reload_interval=5, jar_dir=None, dotenv=False):
+        self.jar_dir = jar_dir  # 各组凭据的Cookie保存目录，为空时不保存
+        self.profiles = [self._make_profile(name, cookie, user_agent)
+                         for name, (cookie, user_agent) in profiles.items()]
+        self.source = source  # 凭据配置文件，修改后自动重新加载
+        self.dotenv = dotenv  # source是.env格式的文件，而不是COOKIE_PROFILES的JSON文件
+        self.quarantine_seconds = quarantine_seconds
+        self.max_quarantine = max_quarantine
+        self.refresh_command = refresh_command
+        self.reload_interval = reload_interval
+        self._cond = threading.Condition()
+        self._next = 0
+        self._source_mtime = self._mtime()
+        self._last_reload_check = time.time()
+
+    def _make_profile(self, name, cookie, user_agent):
+        jar_path = os.path.join(self.jar_dir, f"{name}.json") if self.jar_dir else None
+        return Profile(name, cookie, user_agent, jar_path)
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.source) if self.source else None
+        except OSError:
+            return None
+
+    def _reload_if_changed(self):
+        """配置文件修改后重新加载，Cookie有变化的凭据解除隔离"""
+        now = time.time()
+        if now - self._last_reload_check < self.reload_interval:
+            return
+        self._last_reload_check = now
+        mtime = self._mtime()
+        if mtime is None or mtime == self._source_mtime:
+            return
+        self._source_mtime = mtime
+        try:
+            profiles = load_profiles(env_file=self.source) if self.dotenv else load_profiles(self.source)
+        except Exception as e:
+            logger.error("重新加载凭据配置时出错: %s", e)
+            return
+        known = {profile.name: profile for profile in self.profiles}
+        for name, (cookie, user_agent) in profiles.items():
+            profile = known.get(name)
+            if profile is None:
+                self.profiles.append(self._make_profile(name, cookie, user_agent))
+                logger.info("加载新的凭据 %s", name)
+            elif cookie and cookie != profile.cookie:
+                self._revive(profile, cookie, user_agent)
+
+    def _revive(self, profile, cookie, user_agent=None):
+        profile.set_cookie(cookie)
+        if user_agent:
+            profile.user_agent = user_agent
+        profile.quarantined_until = 0.0
+        logger.info("凭据 %s 已更新，恢复使用", profile.name)
+        self._cond.notify_all()
+
+    def acquire(self):
+        """按顺序轮流返回一组正常的凭据"""
+        with self._cond:
+            while True:
+                self._reload_if_changed()
+                now = time.time()
+                for _ in range(len(self.profiles)):
+                    profile = self.profiles[self._next % len(self.profiles)]
+                    self._next += 1
+                    if profile.healthy(now):
+                        return profile
+                # 全部凭据都被隔离，等待最早结束隔离的凭据，同时定期检查配置文件
+                wait = min(profile.quarantined_until for profile in self.profiles) - now
+                self._cond.wait(max(0.1, min(wait, self.reload_interval)))
+
+    def report_success(self, profile):
+        """请求正常时清零连续失败次数"""
+        profile.failures = 0
+
+    def quarantine(self, profile, reason):
+        """隔离一组凭据，返回是否还有其他正常的凭据"""
+        with self._cond:
+            now = time.time()
+            if profile.healthy(now):
+                profile.failures += 1
+                duration = min(self.quarantine_seconds * 2 ** (profile.failures - 1), self.max_quarantine)
+                profile.quarantined_until = now + duration
+                logger.warning("凭据 %s %s，隔离 %.0f 秒", profile.name, reason, duration)
+                if self.refresh_command and not profile.refreshing:
+                    profile.refreshing = True
+                    threading.Thread(target=self._refresh, args=(profile,), daemon=True).start()
+            return any(other.healthy(now) for other in self.profiles)
+
+    def save(self):
+        """保存各组凭据的Cookie"""
+        for profile in self.profiles:
+            profile.save()
+
+    def _refresh(self, profile):
+        """在后台运行刷新命令，PROFILE_NAME环境变量为凭据名称，命令输出新的Cookie"""
+        try:
+            result = subprocess.run(self.refresh_command, shell=True, capture_output=True, text=True,
+                                    env=dict(os.environ, PROFILE_NAME=profile.name), timeout=600)
+            cookie = result.stdout.strip()
+            if result.returncode == 0 and cookie:
+                with self._cond:
+                    self._revive(profile, cookie)
+            else:
+                logger.error("刷新凭据 %s 失败: %s", profile.name, result.stderr.strip() or '没有输出新的Cookie')
+        except Exception as e:
+            logger.error("刷新凭据 %s 时出错: %s", profile.name, e)
+        finally:
+            profile.refreshing = False
+
+
+def init_credential_pool(headers):
+    """根据.env配置创建凭据池，没有设置COOKIE_PROFILES时只有.env中的一组凭据
+
+    ENV_FILE指定了本节点的.env文件时（distributed.py worker --env-file），监视和重新加载的都是这个文件。
+    """
+    source = os.getenv('COOKIE_PROFILES')
+    if source:
+        profiles = load_profiles(source)
+    else:
+        profiles = {"default": (headers.get('Cookie'), headers.get('User-Agent'))}
+    pool = CredentialPool(
+        profiles,
+        source=source or os.getenv('ENV_FILE', '.env'),
+        quarantine_seconds=float(os.getenv('PROFILE_QUARANTINE_SECONDS', 600)),
+        max_quarantine=float(os.getenv('PROFILE_MAX_QUARANTINE_SECONDS', 3600)),
+        refresh_command=os.getenv('COOKIE_REFRESH_CMD'),
+        jar_dir=os.getenv('COOKIE_JAR_DIR', 'data/cookies'),
+        dotenv=not source,
+    )
+    atexit.register(pool.save)
+    return pool
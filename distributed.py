@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import uuid
+import socket
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from work_queue import open_work_queue, QUEUED, LEASED
+from state_db import get_crawl_state
+from archive import get_archive
+from doc_store import get_document_store
+from log import get_logger
+from metrics import init_metrics
+
+logger = get_logger("distributed")
+
+
+def queue_keyword(queue, crawler, keyword, enqueue=True):
+    """把关键词中尚未保存的论文ID加入工作队列，返回新加入的数量
+
+    enqueue为False时只登记其他关键词已保存的论文，不把剩余的论文放回队列。
+    """
+    from reparse import list_id_pages
+    saved_ids = get_crawl_state().saved_ids(keyword)
+    added = 0
+    for page, filepath in list_id_pages(keyword):
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                paper_ids = [paper["id"] for paper in json.load(f) if "id" in paper]
+        except Exception as e:
+            logger.warning("读取文件 %s 时出错: %s", filepath, e)
+            continue
+        # 其他关键词已解析过的论文直接使用共享详情，不再加入队列
+        remaining_ids, shared_ids = crawler.prepare_page(keyword, page, paper_ids, saved_ids)
+        if shared_ids or (not remaining_ids and crawler.page_file_outdated(keyword, page)):
+            crawler.materialize_page(keyword, page)
+        if enqueue:
+            added += queue.enqueue(keyword, page, remaining_ids)
+    return added
+
+
+def save_results(queue, crawler, rows):
+    """保存节点提交的解析结果，返回涉及的 (关键词, 页码)"""
+    pages = {}
+    for doc_id, keyword, page, result in rows:
+        crawler.save_paper_details(json.loads(result), keyword, page, doc_id)
+        pages.setdefault((keyword, page), []).append(doc_id)
+    get_document_store().flush()
+    for (keyword, page), doc_ids in pages.items():
+        get_crawl_state().mark_saved(keyword, page, doc_ids)
+    queue.mark_collected([row[0] for row in rows])
+    crawler.crawling_status["crawled_count"] += len(rows)
+    return set(pages)
+
+
+def run_coordinator(keywords, poll_interval=2.0):
+    """协调节点：把论文ID放入工作队列，收集各节点的解析结果写入详情文件，队列清空后结束"""
+    import Proquest_crawler2 as crawler
+    init_metrics()
+    queue = open_work_queue()
+    for keyword in keywords:
+        logger.info("关键词 '%s' 新加入队列 %d 篇论文", keyword, queue_keyword(queue, crawler, keyword))
+
+    touched_pages = set()
+    while True:
+        rows = queue.collect()
+        if rows:
+            touched_pages |= save_results(queue, crawler, rows)
+            counts = queue.counts()
+            logger.info("已保存 %d 篇，等待 %d 篇，处理中 %d 篇", crawler.crawling_status['crawled_count'],
+                        counts.get(QUEUED, 0), counts.get(LEASED, 0))
+            continue
+        counts = queue.counts()
+        if not counts.get(QUEUED) and not counts.get(LEASED):
+            break
+        time.sleep(poll_interval)
+
+    # 同一篇论文只在队列中出现一次，属于多个关键词时在这里登记给其他关键词；
+    # 本次失败的论文不放回队列，下次运行协调节点时再重新排队
+    for keyword in keywords:
+        queue_keyword(queue, crawler, keyword, enqueue=False)
+
+    # 由共享详情存储生成各页的详情文件
+    for keyword, page in sorted(touched_pages):
+        crawler.materialize_page(keyword, page)
+
+    failed = queue.failed()
+    for doc_id, keyword, page, error in failed:
+        get_crawl_state().mark_failed(doc_id, error)
+    logger.info("队列已清空，共保存 %d 篇论文，失败 %d 篇", crawler.crawling_status['crawled_count'], len(failed))
+
+
+def run_worker(worker_id, batch_size=None, lease_ttl=120.0, wait_for_work=False, poll_interval=5.0):
+    """爬取节点：从工作队列租用论文ID，用本节点自己的会话请求并解析详情页，把结果提交回队列"""
+    import Proquest_crawler2 as crawler
+    from archive import document_key
+    init_metrics()
+    from pipeline import parse_in_pool
+
+    queue = open_work_queue()
+    batch_size = batch_size or crawler.MAX_CONCURRENT_REQUESTS * 2
+    held = set()
+    held_lock = threading.Lock()
+    stop = threading.Event()
+
+    def heartbeat():
+        # 在租约到期前续租本节点仍在处理的论文
+        while not stop.wait(lease_ttl / 3):
+            with held_lock:
+                doc_ids = list(held)
+            if doc_ids:
+                queue.renew(worker_id, doc_ids, lease_ttl)
+
+    def process(task):
+        doc_id, keyword, page = task
+        try:
+            if stop.is_set():
+                queue.release(worker_id, [doc_id])
+                return
+            html_content, error = crawler.make_detail_request(doc_id)
+            if error:
+                logger.error("获取论文 %s 详情失败: %s", doc_id, error)
+                queue.fail(worker_id, doc_id, error)
+                return
+            get_archive().put(document_key(doc_id), html_content, kind="detail", keyword=keyword)
+            try:
+                details = parse_in_pool("detail", crawler.MAX_WORKERS, crawler.parse_detail_page, html_content, doc_id)
+            except ValueError as e:
+                # 标题为空说明本节点的登录状态已失效，停止本节点，论文留给其他节点
+                logger.error("爬取到空标题数据: %s，停止节点 %s", e, worker_id)
+                stop.set()
+                queue.release(worker_id, [doc_id])
+                return
+            if queue.complete(worker_id, doc_id, json.dumps(details, ensure_ascii=False)):
+                crawler.crawling_status["crawled_count"] += 1
+        finally:
+            with held_lock:
+                held.discard(doc_id)
+
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    heartbeat_thread.start()
+    pool = ThreadPoolExecutor(max_workers=crawler.MAX_CONCURRENT_REQUESTS)
+    try:
+        while not stop.is_set():
+            tasks = queue.lease(worker_id, batch_size, lease_ttl)
+            if not tasks:
+                if not wait_for_work and not queue.counts().get(LEASED):
+                    break
+                time.sleep(poll_interval)
+                continue
+            with held_lock:
+                held.update(task[0] for task in tasks)
+            list(pool.map(process, tasks))
+            logger.info("节点 %s 已完成 %d 篇论文", worker_id, crawler.crawling_status['crawled_count'])
+    finally:
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        # 未处理完的论文立即归还，不必等租约过期
+        with held_lock:
+            if held:
+                queue.release(worker_id, list(held))
+        heartbeat_thread.join()
+        queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多节点分布式爬取论文详情")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+
+    coordinator = subparsers.add_parser("coordinator", help="分配论文ID并保存各节点的结果")
+    coordinator.add_argument("keywords", nargs="+", help="要爬取详情的关键词，需要先完成结果页爬取")
+    coordinator.add_argument("--poll", type=float, default=2.0, help="检查新结果的间隔秒数")
+
+    worker = subparsers.add_parser("worker", help="租用论文ID并爬取详情")
+    worker.add_argument("--env-file", help="本节点使用的.env文件（各节点使用各自的Cookie）")
+    worker.add_argument("--id", help="节点名称，默认使用主机名和随机后缀")
+    worker.add_argument("--batch", type=int, default=None, help="每次租用的论文数")
+    worker.add_argument("--lease-ttl", type=float, default=120.0, help="租约有效秒数，节点崩溃后超过该时间论文会被重新分配")
+    worker.add_argument("--wait", action="store_true", help="队列为空时继续等待新的论文ID")
+    args = parser.parse_args()
+
+    if args.role == "coordinator":
+        run_coordinator(args.keywords, args.poll)
+        return
+
+    # 爬虫模块在导入时读取Cookie等配置，必须先加载本节点的.env文件
+    if args.env_file:
+        load_dotenv(args.env_file, override=True)
+        # 凭据池监视并重新加载本节点的.env文件，而不是默认的.env
+        os.environ['ENV_FILE'] = args.env_file
+    worker_id = args.id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    try:
+        run_worker(worker_id, args.batch, args.lease_ttl, args.wait)
+    except KeyboardInterrupt:
+        logger.warning("节点 %s 已停止，未完成的论文已归还队列", worker_id)
+
+
+if __name__ == "__main__":
+    main()
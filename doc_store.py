@@ -0,0 +1,97 @@
+import os
+import json
+import atexit
+import time
+import sqlite3
+import threading
+from metrics import REGISTRY
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS details (
+    doc_id TEXT PRIMARY KEY,
+    record TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+SHARED_HITS = REGISTRY.counter("proquest_docstore_shared_total", "已在共享详情存储中、不再请求详情页的论文数")
+
+
+class DocumentStore:
+    """所有关键词共享的论文详情存储，每篇论文按ID只保存一份解析结果
+
+    论文属于哪些关键词、哪一页记录在状态数据库的keyword_documents表中，
+    各关键词的详情文件由这里的记录生成。写入先缓存在内存中，flush时在一个事务中提交。
+    """
+
+    def __init__(self, path="data/documents.db"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._pending = {}  # 论文ID -> 尚未提交的记录
+        self._lock = threading.Lock()
+
+    def put(self, doc_id, record):
+        """保存一篇论文的详情，已有记录时覆盖"""
+        with self._lock:
+            self._pending[doc_id] = record
+
+    def flush(self):
+        """提交缓存的记录"""
+        with self._lock:
+            if not self._pending:
+                return
+            now = time.time()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO details (doc_id, record, updated_at) VALUES (?, ?, ?)",
+                    [(doc_id, json.dumps(record, ensure_ascii=False), now)
+                     for doc_id, record in self._pending.items()])
+            self._pending.clear()
+
+    def _select(self, columns, doc_ids):
+        rows = []
+        for i in range(0, len(doc_ids), 500):
+            chunk = doc_ids[i:i + 500]
+            rows += self._conn.execute(
+                f"SELECT {columns} FROM details WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        return rows
+
+    def known_ids(self, doc_ids):
+        """返回已保存详情的论文ID"""
+        doc_ids = list(doc_ids)
+        with self._lock:
+            known = {doc_id for doc_id in doc_ids if doc_id in self._pending}
+            known.update(row[0] for row in self._select("doc_id", [d for d in doc_ids if d not in known]))
+        return known
+
+    def get_many(self, doc_ids):
+        """读取多篇论文的详情: {论文ID: 记录}，没有保存的论文不包括在内"""
+        doc_ids = list(doc_ids)
+        with self._lock:
+            records = {doc_id: self._pending[doc_id] for doc_id in doc_ids if doc_id in self._pending}
+            for doc_id, record in self._select("doc_id, record", [d for d in doc_ids if d not in records]):
+                records[doc_id] = json.loads(record)
+        return records
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store():
+    """获取共享的论文详情存储，路径可通过DOC_STORE_DB配置"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DocumentStore(os.getenv('DOC_STORE_DB', 'data/documents.db'))
+            # 退出时提交尚未flush的记录并关闭数据库
+            atexit.register(_store.close)
+        return _store
@@ -0,0 +1,246 @@
+import os
+import re
+import json
+import time
+import shutil
+import argparse
+from storage import init_details_store
+from Proquest_crawler2 import DOC_ID_RE
+
+# 需要安装pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+YEAR_RE = re.compile(r'(1[89]\d\d|20\d\d)')
+MANIFEST = "_manifest.json"
+# 年份未知的分区目录名，pyarrow按hive分区读取时解析为null
+UNKNOWN_YEAR = "__HIVE_DEFAULT_PARTITION__"
+
+# parse_detail_page的字段: (字段名, 类型)
+# 取值重复较多的字段（学校、国家、城市等）使用字典编码，列表字段保存为list<string>
+STRING_FIELDS = ["Title", "Author", "Document URL", "Abstract", "Publication Year"]
+DICTIONARY_FIELDS = ["degree type", "advisor", "University/institute", "University location-country",
+                     "University location-city", "Department"]
+LIST_FIELDS = ["subject", "Classification", "Identifier / keyword", "Committee member"]
+
+
+def details_schema():
+    fields = [pa.field("doc_id", pa.string()), pa.field("page", pa.int32()), pa.field("year", pa.int16())]
+    fields += [pa.field(name, pa.string()) for name in STRING_FIELDS]
+    fields += [pa.field(name, pa.dictionary(pa.int32(), pa.string())) for name in DICTIONARY_FIELDS]
+    fields += [pa.field(name, pa.list_(pa.string())) for name in LIST_FIELDS]
+    return pa.schema(fields)
+
+
+def parse_year(value):
+    match = YEAR_RE.search(value or "")
+    return int(match.group(1)) if match else None
+
+
+def as_list(value):
+    """列表字段统一为字符串列表，旧数据中可能是字符串或缺失"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+def records_to_table(records, page):
+    """把一页的论文详情转换为Arrow表"""
+    columns = {"doc_id": [], "page": [], "year": []}
+    for name in STRING_FIELDS + DICTIONARY_FIELDS + LIST_FIELDS:
+        columns[name] = []
+    for record in records:
+        doc_id_match = DOC_ID_RE.search(record.get("Document URL") or "")
+        columns["doc_id"].append(doc_id_match.group(1) if doc_id_match else None)
+        columns["page"].append(page)
+        columns["year"].append(parse_year(record.get("Publication Year")))
+        for name in STRING_FIELDS + DICTIONARY_FIELDS:
+            value = record.get(name)
+            columns[name].append(str(value) if value not in (None, "") else None)
+        for name in LIST_FIELDS:
+            columns[name].append(as_list(record.get(name)))
+    return pa.table(columns, schema=details_schema())
+
+
+class ParquetExporter:
+    """把详情JSONL导出为按关键词和年份分区的Parquet数据集
+
+    目录结构为 <输出目录>/keyword=<关键词>/year=<年份>/part-<时间戳>.parquet，年份未知时为year=__HIVE_DEFAULT_PARTITION__。
+    _manifest.json记录每页JSONL导出时的大小和修改时间以及写入的文件：再次导出时只处理新增或有变化的页面，
+    有变化的页面先从原来的文件中删除对应的行再追加。
+    """
+
+    def __init__(self, out_dir="data/parquet", store=None, compression="zstd"):
+        if pa is None:
+            raise RuntimeError("导出Parquet需要安装pyarrow: pip install pyarrow")
+        self.out_dir = out_dir
+        self.store = store or init_details_store()
+        self.compression = compression
+        self.manifest_path = os.path.join(out_dir, MANIFEST)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"keywords": {}}
+
+    def _save_manifest(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def list_pages(self, keyword):
+        """关键词已保存详情的页面: {页码: (文件路径, 大小, 修改时间)}，旧版本只有JSON文件的页面也包括在内
+
+        同时有JSONL和JSON时以JSONL为准；导出时读取的就是这里返回的文件，不会转换旧版文件的格式。
+        """
+        safe_keyword = keyword.replace(' ', '_')
+        keyword_dir = os.path.join(self.store.base_dir, safe_keyword)
+        if not os.path.isdir(keyword_dir):
+            return {}
+        page_re = re.compile(rf'^{re.escape(safe_keyword)}(\d+)\.jsonl?$')
+        pages = {}
+        for filename in os.listdir(keyword_dir):
+            match = page_re.match(filename)
+            if not match:
+                continue
+            page = int(match.group(1))
+            if page in pages:
+                continue
+            path = self.store.existing_page_path(keyword, page)
+            stat = os.stat(path)
+            pages[page] = (path, stat.st_size, stat.st_mtime)
+        return pages
+
+    def _write_part(self, keyword_dir, year, table):
+        """写入一个分区文件，返回相对于输出目录的路径"""
+        partition = os.path.join(keyword_dir, f"year={year if year is not None else UNKNOWN_YEAR}")
+        os.makedirs(os.path.join(self.out_dir, partition), exist_ok=True)
+        relpath = os.path.join(partition, f"part-{time.time_ns()}.parquet")
+        path = os.path.join(self.out_dir, relpath)
+        pq.write_table(table, path + ".tmp", compression=self.compression, use_dictionary=DICTIONARY_FIELDS)
+        os.replace(path + ".tmp", path)
+        return relpath
+
+    def _remove_pages(self, files, pages):
+        """从已导出的文件中删除这些页面的行，返回 {原文件: 新文件或None}"""
+        replaced = {}
+        page_values = pa.array(sorted(pages), pa.int32())
+        for relpath in files:
+            path = os.path.join(self.out_dir, relpath)
+            if not os.path.exists(path):
+                replaced[relpath] = None
+                continue
+            table = pq.read_table(path, schema=details_schema())
+            kept = table.filter(pc.invert(pc.is_in(table["page"], value_set=page_values)))
+            os.remove(path)
+            if kept.num_rows:
+                new_path = path + ".tmp"
+                pq.write_table(kept, new_path, compression=self.compression, use_dictionary=DICTIONARY_FIELDS)
+                os.replace(new_path, path)
+                replaced[relpath] = relpath
+            else:
+                replaced[relpath] = None
+        return replaced
+
+    def export_keyword(self, keyword, full=False):
+        """导出一个关键词，full为True时重新导出全部页面，返回 (导出的页数, 导出的记录数)"""
+        safe_keyword = keyword.replace(' ', '_')
+        keyword_dir = f"keyword={safe_keyword}"
+        state = self.manifest["keywords"].setdefault(safe_keyword, {"pages": {}})
+        exported = state["pages"]  # 页码(字符串) -> {"size", "mtime", "files"}
+
+        pages = self.list_pages(keyword)
+        if full:
+            # 重新导出时清空该关键词的目录，manifest中没有记录的旧文件也一并删除
+            shutil.rmtree(os.path.join(self.out_dir, keyword_dir), ignore_errors=True)
+            exported.clear()
+            changed = sorted(pages)
+        else:
+            changed = [page for page, (path, size, mtime) in sorted(pages.items())
+                       if str(page) not in exported
+                       or [exported[str(page)]["size"], exported[str(page)]["mtime"]] != [size, mtime]]
+        if not changed:
+            return 0, 0
+
+        # 已导出过的页面有变化时，先从原来的文件中删除这些页面的行
+        stale_pages = [page for page in changed if str(page) in exported]
+        stale_files = sorted({relpath for page in stale_pages for relpath in exported[str(page)]["files"]})
+        if stale_files:
+            replaced = self._remove_pages(stale_files, stale_pages)
+            for info in exported.values():
+                info["files"] = [replaced.get(relpath, relpath) for relpath in info["files"]
+                                 if replaced.get(relpath, relpath) is not None]
+
+        # 按年份分组后每个分区写一个文件
+        by_year = {}
+        page_years = {}
+        for page in changed:
+            table = records_to_table(self.store.read_file(pages[page][0]), page)
+            if not table.num_rows:
+                continue
+            for year in pc.unique(table["year"]).to_pylist():
+                mask = pc.is_null(table["year"]) if year is None else pc.equal(table["year"], year)
+                by_year.setdefault(year, []).append(table.filter(mask))
+                page_years.setdefault(page, []).append(year)
+
+        year_files = {year: self._write_part(keyword_dir, year, pa.concat_tables(tables))
+                      for year, tables in by_year.items()}
+        rows = sum(table.num_rows for tables in by_year.values() for table in tables)
+        for page in changed:
+            path, size, mtime = pages[page]
+            exported[str(page)] = {"size": size, "mtime": mtime,
+                                   "files": [year_files[year] for year in page_years.get(page, [])]}
+        self._save_manifest()
+        return len(changed), rows
+
+
+def list_keywords(base_dir="data/data_details"):
+    """已保存详情的全部关键词（目录名）"""
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(name for name in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, name)))
+
+
+def load_details(out_dir="data/parquet", keyword=None, columns=None):
+    """读取导出的数据集为Arrow表，keyword为空时读取全部关键词；.to_pandas()可转换为DataFrame"""
+    import pyarrow.dataset as ds
+    # 文件中已有year列，分区的年份按同样的类型解析
+    partitioning = ds.partitioning(pa.schema([("keyword", pa.string()), ("year", pa.int16())]), flavor="hive")
+    schema = details_schema().append(pa.field("keyword", pa.string()))
+    dataset = ds.dataset(out_dir, schema=schema, format="parquet", partitioning=partitioning,
+                         ignore_prefixes=[".", "_"])
+    filter_expr = ds.field("keyword") == keyword.replace(' ', '_') if keyword else None
+    return dataset.to_table(columns=columns, filter=filter_expr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把论文详情导出为按关键词和年份分区的Parquet数据集")
+    parser.add_argument("keywords", nargs="*", help="要导出的关键词，默认导出全部")
+    parser.add_argument("--out", default=os.getenv('PARQUET_DIR', 'data/parquet'), help="输出目录")
+    parser.add_argument("--full", action="store_true", help="重新导出全部页面，而不是只导出新增和有变化的页面")
+    args = parser.parse_args()
+
+    exporter = ParquetExporter(args.out)
+    keywords = args.keywords or list_keywords(exporter.store.base_dir)
+    for keyword in keywords:
+        start = time.perf_counter()
+        pages, rows = exporter.export_keyword(keyword, full=args.full)
+        if pages:
+            print(f"关键词 '{keyword}' 导出 {pages} 页，{rows} 篇论文，耗时 {time.perf_counter() - start:.2f} 秒")
+        else:
+            print(f"关键词 '{keyword}' 没有新的详情需要导出")
+
+
+if __name__ == "__main__":
+    main()
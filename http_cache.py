@@ -0,0 +1,157 @@
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access);
+"""
+
+
+class CachedResponse:
+    """从缓存返回的响应，提供爬虫用到的属性"""
+
+    from_cache = True
+    status_code = 200
+    raw = None
+    blocked = None
+    profile = None
+
+    def __init__(self, url, text):
+        self.url = url
+        self.text = text
+        self.headers = {}
+
+
+class HttpCache:
+    """按URL缓存响应内容的磁盘缓存
+
+    在有效期（TTL）内直接返回缓存的内容；过期后服务器给过ETag或Last-Modified时发送条件请求，
+    返回304则继续使用缓存，否则重新请求。缓存总大小超过上限时按最近访问时间淘汰。
+    """
+
+    def __init__(self, root="data/http_cache", ttl=7 * 86400, max_bytes=1024 ** 3):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _path(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], f"{digest}.gz")
+
+    def lookup(self, url, ttl=None):
+        """查找缓存，返回 (内容, 是否仍在有效期内, 条件请求头)，没有缓存时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, fetched_at FROM entries WHERE url = ?", (url,)).fetchone()
+        if not row:
+            return None
+        etag, last_modified, fetched_at = row
+        try:
+            with open(self._path(url), 'rb') as f:
+                text = gzip.decompress(f.read()).decode('utf-8')
+        except (OSError, EOFError):
+            self.invalidate(url)
+            return None
+        fresh = time.time() - fetched_at < (self.ttl if ttl is None else ttl)
+        validators = {}
+        if etag:
+            validators['If-None-Match'] = etag
+        if last_modified:
+            validators['If-Modified-Since'] = last_modified
+        if fresh:
+            self.touch(url, revalidated=False)
+        return text, fresh, validators
+
+    def touch(self, url, revalidated=True):
+        """更新访问时间，revalidated为True时（服务器返回304）重新开始计算有效期"""
+        now = time.time()
+        with self._lock, self._conn:
+            if revalidated:
+                self._conn.execute("UPDATE entries SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+            else:
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (now, url))
+
+    def store(self, url, text, etag=None, last_modified=None):
+        """保存响应内容，超过大小上限时淘汰最久未访问的条目"""
+        data = gzip.compress(text.encode('utf-8'), compresslevel=6)
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                row = self._conn.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (url, etag, last_modified, fetched_at, last_access, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (url, etag, last_modified, now, now, len(data)))
+            self._total += len(data) - (row[0] if row else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """淘汰最久未访问的条目，直到总大小降到上限的90%以下"""
+        target = self.max_bytes * 0.9
+        removed = []
+        for url, size in self._conn.execute("SELECT url, size FROM entries ORDER BY last_access").fetchall():
+            if self._total <= target:
+                break
+            removed.append(url)
+            self._total -= size
+        with self._conn:
+            self._conn.executemany("DELETE FROM entries WHERE url = ?", [(url,) for url in removed])
+        for url in removed:
+            try:
+                os.remove(self._path(url))
+            except OSError:
+                pass
+
+    def invalidate(self, url):
+        """删除一个缓存条目"""
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+            if not row:
+                return
+            with self._conn:
+                self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._total -= row[0]
+        try:
+            os.remove(self._path(url))
+        except OSError:
+            pass
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def init_http_cache():
+    """根据.env配置创建HTTP缓存，HTTP_CACHE_DIR为空时不使用缓存"""
+    root = os.getenv('HTTP_CACHE_DIR', 'data/http_cache')
+    if not root:
+        return None
+    return HttpCache(
+        root=root,
+        ttl=float(os.getenv('HTTP_CACHE_TTL', 7 * 86400)),
+        max_bytes=int(float(os.getenv('HTTP_CACHE_MAX_MB', 1024)) * 1024 * 1024),
+    )
@@ -0,0 +1,207 @@
+import os
+import time
+import threading
+import requests
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from urllib.parse import urlsplit, urlencode
+from requests.adapters import HTTPAdapter
+from credentials import init_credential_pool
+from http_cache import init_http_cache, CachedResponse
+from metrics import REGISTRY
+from profiling import span
+
+# HTTP/2需要安装httpx[http2]，未安装时使用requests连接池
+try:
+    import httpx
+    import h2  # noqa: F401
+except ImportError:
+    httpx = None
+
+# 响应内容中出现验证码元素时说明是验证码页面，停止下载剩余内容
+# 只匹配标签中的id属性，正文或脚本中出现captcha-container字样的正常页面不受影响
+BLOCK_MARKERS = (b'id="captcha-container"', b"id='captcha-container'")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+REQUESTS = REGISTRY.counter("proquest_requests_total", "发送的HTTP请求数，status为状态码、verify/captcha或error", ("status",))
+FETCH_SECONDS = REGISTRY.histogram("proquest_fetch_seconds", "HTTP请求的耗时（含读取响应内容）")
+CACHE_LOOKUPS = REGISTRY.counter("proquest_cache_total", "HTTP缓存查找结果: hit、revalidated或miss", ("result",))
+
+
+def has_block_marker(text):
+    """页面文本中是否有验证码元素"""
+    return any(marker.decode() in text for marker in BLOCK_MARKERS)
+
+
+class StreamedResponse:
+    """流式读取的响应，blocked为提前停止下载的原因（verify或captcha），正常页面为None"""
+
+    from_cache = False
+    profile = None  # 发送请求时使用的凭据，由ProquestClient.get设置
+
+    def __init__(self, response, body, blocked=None):
+        self.status_code = response.status_code
+        self.url = response.url
+        self.headers = response.headers
+        self.raw = getattr(response, 'raw', None)
+        self.blocked = blocked
+        self.text = body.decode(response.encoding or 'utf-8', errors='replace')
+
+
+class ProquestClient:
+    """两个爬虫阶段共用的HTTP客户端，负责连接复用和凭据轮换"""
+
+    def __init__(self, headers, pool_size=10, http2=True, timeout=30):
+        # Cookie和User-Agent由凭据池按组维护，其余请求头作为默认请求头
+        self.headers = {k: v for k, v in headers.items() if k != 'Cookie' and v is not None}
+        self.credentials = init_credential_pool(headers)
+        # HTTP缓存在第一次请求时才打开，只导入爬虫模块时不创建缓存数据库
+        self._cache = None
+        self._cache_loaded = False
+        self._cache_lock = threading.Lock()
+        self.timeout = timeout
+        # 验证页面所在的域名，被重定向到这里时不再读取响应内容
+        self.block_hosts = tuple(host.strip() for host in os.getenv('VERIFY_HOSTS', 'verify.proquest.com').split(','))
+
+        # Cookie由各组凭据自己维护，会话的Cookie罐不接受任何Cookie，避免凭据之间互相串用
+        no_cookies = DefaultCookiePolicy(allowed_domains=[])
+        self.http2 = bool(http2 and httpx is not None)
+        if self.http2:
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            self._client = httpx.Client(http2=True, limits=limits, follow_redirects=True,
+                                        cookies=CookieJar(policy=no_cookies))
+        else:
+            self._client = requests.Session()
+            self._client.cookies.set_policy(no_cookies)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self._client.mount('https://', adapter)
+            self._client.mount('http://', adapter)
+
+    @property
+    def cache(self):
+        with self._cache_lock:
+            if not self._cache_loaded:
+                self._cache = init_http_cache()
+                self._cache_loaded = True
+            return self._cache
+
+    def acquire_profile(self):
+        """取一组正常的凭据用于下一次请求"""
+        return self.credentials.acquire()
+
+    def get(self, url, params=None, headers=None, profile=None, limiter=None, cacheable=None, cache_ttl=None):
+        """用指定（默认轮换到的）凭据发送GET请求，并根据响应更新该凭据的Cookie
+
+        实际使用的凭据保存在响应的profile属性中，缓存命中时不占用凭据，profile为None。
+        传入cacheable(页面内容)时先查HTTP缓存：有效期内直接返回缓存（不经过限速器），过期时发送条件请求，
+        服务器返回304时也返回缓存；新的200响应在cacheable判断页面完整时写入缓存。
+        limiter只在真正发送请求前调用。
+        """
+        cache_key = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+        cached = None
+        if self.cache is not None and cacheable is not None:
+            cached = self.cache.lookup(cache_key, cache_ttl)
+            if cached is not None and cached[1]:
+                CACHE_LOOKUPS.inc(result="hit")
+                return CachedResponse(url, cached[0])
+
+        if limiter is not None:
+            limiter.acquire()
+        profile = profile or self.acquire_profile()
+        request_headers = dict(self.headers)
+        if profile.user_agent:
+            request_headers['User-Agent'] = profile.user_agent
+        if headers:
+            request_headers.update(headers)
+        cookie = profile.cookie_header(urlsplit(url).path or "/")
+        if cookie:
+            request_headers['Cookie'] = cookie
+        if cached is not None:
+            request_headers.update(cached[2])
+
+        start = time.perf_counter()
+        try:
+            with span("network"):
+                response = self._send(url, params, request_headers)
+        except Exception:
+            REQUESTS.inc(status="error")
+            raise
+        finally:
+            FETCH_SECONDS.observe(time.perf_counter() - start)
+        REQUESTS.inc(status=response.blocked or response.status_code)
+        self.update_from_response(response, profile)
+        response.profile = profile
+
+        if cached is not None and response.status_code == 304:
+            CACHE_LOOKUPS.inc(result="revalidated")
+            self.cache.touch(cache_key)
+            revalidated = CachedResponse(url, cached[0])
+            revalidated.profile = profile
+            return revalidated
+        if self.cache is not None and cacheable is not None:
+            CACHE_LOOKUPS.inc(result="miss")
+        # 被重定向到其他域名（如验证页面）的响应不缓存
+        if (cacheable is not None and self.cache is not None and response.status_code == 200
+                and not response.blocked and urlsplit(str(response.url)).netloc == urlsplit(url).netloc and cacheable(response.text)):
+            self.cache.store(cache_key, response.text, response.headers.get('ETag'),
+                             response.headers.get('Last-Modified'))
+        return response
+
+    def _send(self, url, params, headers):
+        """流式发送请求，被重定向到验证页面或内容中出现验证码标记时提前停止下载"""
+        if self.http2:
+            with self._client.stream('GET', url, params=params, headers=headers, timeout=self.timeout) as response:
+                return self._read(response, response.iter_bytes)
+        response = self._client.get(url, params=params, headers=headers, timeout=self.timeout, stream=True)
+        try:
+            return self._read(response, lambda: response.iter_content(STREAM_CHUNK_SIZE))
+        finally:
+            response.close()
+
+    def _read(self, response, iter_chunks):
+        if urlsplit(str(response.url)).hostname in self.block_hosts:
+            return StreamedResponse(response, b"", blocked="verify")
+        chunks = []
+        tail = b""
+        overlap = max(len(marker) for marker in BLOCK_MARKERS) - 1
+        for chunk in iter_chunks():
+            chunks.append(chunk)
+            # 带上前一块的末尾，避免标记跨块时漏检
+            window = tail + chunk
+            if any(marker in window for marker in BLOCK_MARKERS):
+                return StreamedResponse(response, b"".join(chunks), blocked="captcha")
+            tail = window[-overlap:]
+        return StreamedResponse(response, b"".join(chunks))
+
+    def update_from_response(self, response, profile):
+        """根据响应中的Set-Cookie更新凭据的Cookie"""
+        # requests合并了多个Set-Cookie头，需要从原始响应头中逐个读取
+        raw = getattr(response, 'raw', None)
+        response_headers = raw.headers if raw is not None and hasattr(raw, 'headers') else response.headers
+        profile.update_from_headers(response_headers)
+
+    def report_success(self, profile):
+        self.credentials.report_success(profile)
+
+    def quarantine(self, profile, reason):
+        """凭据遇到403或验证页面时隔离，返回是否还有其他正常的凭据可以继续爬取"""
+        return self.credentials.quarantine(profile, reason)
+
+    def close(self):
+        self._client.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(headers):
+    """获取共享的HTTP客户端，首次调用时根据.env配置创建"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            max_concurrent = int(os.getenv('MAX_CONCURRENT_REQUESTS', 5))
+            pool_size = int(os.getenv('HTTP_POOL_SIZE', max(max_concurrent, 10)))
+            http2 = os.getenv('HTTP2', '1').lower() not in ('0', 'false', 'no')
+            timeout = float(os.getenv('REQUEST_TIMEOUT', 30))
+            _client = ProquestClient(headers, pool_size=pool_size, http2=http2, timeout=timeout)
+        return _client
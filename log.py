@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import logging
+import threading
+
+LOGGER_NAME = "proquest"
+
+
+class RateLimitFilter(logging.Filter):
+    """同一条日志模板在interval秒内最多输出burst次，省略的条数附加在下一次输出的日志后面
+
+    日志需要用 logger.info("第 %d 页", page) 的形式传入参数，按模板而不是格式化后的内容计数；
+    ERROR及以上级别的日志不限流。
+    """
+
+    def __init__(self, burst=5, interval=10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}  # (日志名称, 模板) -> [窗口开始时间, 已输出条数, 省略条数]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or self.burst <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                return True
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.msg}（省略了 {suppressed} 条同类日志）"
+        return True
+
+
+_handler = logging.StreamHandler(sys.stdout)
+_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", "%H:%M:%S"))
+_rate_limit = RateLimitFilter()
+_handler.addFilter(_rate_limit)
+_root = logging.getLogger(LOGGER_NAME)
+_root.addHandler(_handler)
+_root.setLevel(logging.INFO)
+_root.propagate = False
+
+
+def get_logger(name):
+    """获取模块的日志记录器，输出格式和限流由本模块统一配置"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def init_logging():
+    """根据.env配置日志级别和限流，LOG_RATE_BURST为0时不限流"""
+    _root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    _rate_limit.burst = int(os.getenv('LOG_RATE_BURST', 5))
+    _rate_limit.interval = float(os.getenv('LOG_RATE_INTERVAL', 10))
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import atexit
+import threading
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from log import get_logger
+
+logger = get_logger("metrics")
+
+# 延迟类直方图的默认分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """带标签的指标，各标签组合的值单独保存"""
+
+    type_name = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}  # 标签值元组 -> 值
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def items(self):
+        with self._lock:
+            return [(key, self._copy(value)) for key, value in sorted(self._values.items())]
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in self.items()]
+
+    def snapshot(self):
+        return [{"labels": dict(zip(self.label_names, key)), "value": value} for key, value in self.items()]
+
+
+class Gauge(Counter):
+    """可以任意设置的当前值，例如队列长度"""
+
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """按分桶统计的分布，例如请求耗时"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]  # [各分桶计数, 总数, 总和]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += 1
+            entry[2] += value
+
+    def time(self, **labels):
+        """用作with语句，统计代码块的耗时"""
+        return _Timer(self, labels)
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def render(self):
+        lines = []
+        for key, (counts, count, total) in self.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+    def snapshot(self):
+        return [{"labels": dict(zip(self.label_names, key)), "count": count, "sum": round(total, 6),
+                 "p50": self._quantile(counts, count, 0.5), "p99": self._quantile(counts, count, 0.99)}
+                for key, (counts, count, total) in self.items()]
+
+    def _quantile(self, counts, count, fraction):
+        """按分桶估计分位数，返回所在分桶的上界，超过最大分桶时返回None"""
+        if not count:
+            return None
+        target = fraction * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return None
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    """进程内的全部指标，可以导出为Prometheus文本格式或JSON快照"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, label_names, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, label_names, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter, name, help_text, label_names)
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def _sorted(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def render_prometheus(self):
+        lines = []
+        for metric in self._sorted():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {"time": time.time(),
+                "metrics": {metric.name: {"type": metric.type_name, "values": metric.snapshot()}
+                            for metric in self._sorted()}}
+
+    def write_snapshot(self, path):
+        """原子地写入JSON快照"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+# 各模块在导入时注册指标，导出方式由init_metrics根据.env配置
+REGISTRY = MetricsRegistry()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith('/metrics.json'):
+            body = json.dumps(self.registry.snapshot(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        elif self.path.startswith('/metrics'):
+            body = self.registry.render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_http_server(port, host="0.0.0.0", registry=REGISTRY):
+    """在后台线程中提供 /metrics（Prometheus文本格式）和 /metrics.json"""
+    handler = type("BoundMetricsHandler", (MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_snapshot_writer(path, interval=30.0, registry=REGISTRY):
+    """在后台线程中每interval秒写入一次JSON快照，进程退出时再写一次"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                registry.write_snapshot(path)
+            except OSError:
+                pass
+
+    def final():
+        stop.set()
+        registry.write_snapshot(path)
+
+    threading.Thread(target=run, daemon=True).start()
+    atexit.register(final)
+    return stop
+
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def init_metrics():
+    """根据.env配置启动指标导出，多次调用只启动一次
+
+    METRICS_PORT不为空时提供HTTP端点，METRICS_SNAPSHOT不为空时定期写入JSON快照。
+    解析子进程导入爬虫模块时也会调用，只在主进程中导出。
+    """
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return REGISTRY
+        _initialized = True
+        if multiprocessing.parent_process() is not None:
+            return REGISTRY
+        port = os.getenv('METRICS_PORT')
+        if port:
+            server = start_http_server(int(port), os.getenv('METRICS_HOST', '0.0.0.0'))
+            logger.info("指标端点: http://%s:%d/metrics", server.server_address[0], server.server_port)
+        snapshot_path = os.getenv('METRICS_SNAPSHOT')
+        if snapshot_path:
+            start_snapshot_writer(snapshot_path, float(os.getenv('METRICS_SNAPSHOT_INTERVAL', 30)))
+        return REGISTRY
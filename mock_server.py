@@ -0,0 +1,215 @@
+import re
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+from archive import load_fixtures
+
+RESULTS_PATH_RE = re.compile(r'^/results/([^/?]+)/(\d+)$')
+DOCVIEW_PATH_RE = re.compile(r'^/docview/(\d+)/abstract$')
+DOCVIEW_ID_RE = re.compile(r'/docview/(\d+)')
+RESULTS_COUNT_RE = re.compile(r'(<h1[^>]*id="pqResultsCount"[^>]*>)[^<]*')
+
+NO_RESULTS_PAGE = '<html><body><div class="noResults">No results found</div></body></html>'
+CAPTCHA_PAGE = '<html><body><div id="captcha-container">请完成验证</div></body></html>'
+
+
+def synthetic_results_page(total, page, doc_ids):
+    """生成结构与ProQuest结果页一致的页面"""
+    items = ''.join(
+        f'<li class="resultItem"><div class="resultHeader"><h3><a href="/docview/{doc_id}/abstract">'
+        f'Synthetic dissertation {doc_id} on protein folding and enzyme kinetics</a></h3></div>'
+        f'<div class="truncatedAbstract">{"Lorem ipsum dolor sit amet. " * 20}</div></li>'
+        for doc_id in doc_ids)
+    return (f'<html><head><title>Results page {page}</title></head><body>'
+            f'<h1 id="pqResultsCount">{total:,} results</h1><ul class="resultItems">{items}</ul></body></html>')
+
+
+def synthetic_detail_page(doc_id):
+    """生成结构与ProQuest详情页一致的页面"""
+    rows = [
+        ("Advisor", "Smith, John"),
+        ("University/institution", "Example University"),
+        ("University location", "United States -- California"),
+        ("Department", "Biochemistry"),
+        ("Publication year", "2020"),
+        ("Degree", "Ph.D."),
+        ("Subject", "Biochemistry; Molecular biology"),
+        ("Classification", "0487: Biochemistry\n0307: Molecular biology"),
+        ("Identifier / keyword", "Protein folding; Enzyme kinetics"),
+        ("Committee member", "Doe, Jane; Roe, Richard"),
+    ]
+    indexing = ''.join(
+        f'<div class="display_record_indexing_row"><div class="display_record_indexing_fieldname">{name}</div>'
+        f'<div class="display_record_indexing_data">{value}</div></div>' for name, value in rows)
+    return (f'<html><body><h1 class="documentTitle">Synthetic dissertation {doc_id}</h1>'
+            f'<div id="authordiv"><a class="author-name">Author {doc_id}</a></div>'
+            f'<div class="abstractContainer"><div class="abstract">{"Abstract text. " * 100}</div></div>'
+            f'<a href="/docview/{doc_id}/abstract">Document URL</a>{indexing}</body></html>')
+
+
+class MockProquest:
+    """模拟ProQuest的页面内容和故障
+
+    有debug_html中保存的页面时用这些页面作为模板：结果页中的文档ID被替换为按页码编号的唯一ID，
+    详情页按文档ID轮流选取；没有保存的页面时生成结构相同的页面。
+    """
+
+    def __init__(self, fixtures_root=None, total=3200, per_page=100, latency=0.0, jitter=0.0,
+                 rate_429=0.0, rate_403=0.0, rate_verify=0.0, retry_after=1, seed=None):
+        self.total = total
+        self.per_page = per_page
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rate_403 = rate_403
+        self.rate_verify = rate_verify
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.results_templates, self.detail_templates = [], []
+        if fixtures_root:
+            results_pages, detail_pages = load_fixtures(fixtures_root)
+            self.results_templates = [html for html in results_pages if 'resultItem' in html]
+            self.detail_templates = [html for _, html in detail_pages if 'documentTitle' in html]
+
+    def random(self):
+        with self._random_lock:
+            return self._random.random()
+
+    def delay(self):
+        """本次响应的延迟秒数"""
+        if not self.latency and not self.jitter:
+            return 0.0
+        return max(0.0, self.latency + (self.random() * 2 - 1) * self.jitter)
+
+    def fault(self):
+        """按配置的比例返回本次注入的故障: 429、403、verify或None"""
+        roll = self.random()
+        for kind, rate in ((429, self.rate_429), (403, self.rate_403), ("verify", self.rate_verify)):
+            if roll < rate:
+                return kind
+            roll -= rate
+        return None
+
+    def doc_ids(self, page):
+        """第page页的文档ID，超出总结果数时为空"""
+        first = (page - 1) * self.per_page
+        last = min(page * self.per_page, self.total)
+        return [str(1000000000 + index) for index in range(first, last)]
+
+    def results_page(self, page):
+        doc_ids = self.doc_ids(page)
+        if not doc_ids:
+            return NO_RESULTS_PAGE
+        if not self.results_templates:
+            return synthetic_results_page(self.total, page, doc_ids)
+        html = self.results_templates[(page - 1) % len(self.results_templates)]
+        html = RESULTS_COUNT_RE.sub(lambda m: f"{m.group(1)}{self.total:,} results", html, count=1)
+        # 模板中的文档ID依次替换为本页的ID，同一条目中重复出现的ID替换为同一个值
+        mapping = {}
+
+        def replace(match):
+            if match.group(1) not in mapping:
+                mapping[match.group(1)] = doc_ids[len(mapping) % len(doc_ids)]
+            return f"/docview/{mapping[match.group(1)]}"
+        return DOCVIEW_ID_RE.sub(replace, html)
+
+    def detail_page(self, doc_id):
+        if not self.detail_templates:
+            return synthetic_detail_page(doc_id)
+        html = self.detail_templates[int(doc_id) % len(self.detail_templates)]
+        return DOCVIEW_ID_RE.sub(f"/docview/{doc_id}", html)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和内容分两次写入，关闭Nagle算法避免每个响应多等待一次延迟确认
+    disable_nagle_algorithm = True
+    mock = None  # 由make_server设置
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body="", headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        mock = self.mock
+        path = urlsplit(self.path).path
+        if path == '/verify':
+            self._send(200, CAPTCHA_PAGE)
+            return
+
+        results_match = RESULTS_PATH_RE.match(path)
+        docview_match = DOCVIEW_PATH_RE.match(path)
+        if not results_match and not docview_match:
+            self._send(404, "Not Found")
+            return
+
+        delay = mock.delay()
+        if delay:
+            time.sleep(delay)
+
+        fault = mock.fault()
+        if fault == 429:
+            self._send(429, "Too Many Requests", {'Retry-After': str(mock.retry_after)})
+        elif fault == 403:
+            self._send(403, "Forbidden")
+        elif fault == "verify":
+            # 验证页面放在另一个主机名下，与真实网站的verify.proquest.com对应
+            self._send(302, headers={'Location': f"http://localhost:{self.server.server_port}/verify"})
+        elif results_match:
+            self._send(200, mock.results_page(int(results_match.group(2))))
+        else:
+            self._send(200, mock.detail_page(docview_match.group(1)))
+
+
+def make_server(mock, host="127.0.0.1", port=0):
+    """创建模拟服务器，port为0时使用随机端口"""
+    handler = type("BoundMockHandler", (MockHandler,), {"mock": mock})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟ProQuest服务器，用于离线测试和性能测试")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口，0表示随机端口")
+    parser.add_argument("--fixtures", default="debug_html", help="保存的页面目录，设为空则生成页面")
+    parser.add_argument("--total", type=int, default=3200, help="总结果数")
+    parser.add_argument("--per-page", type=int, default=100, help="每页结果数")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个响应的平均延迟秒数")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机波动秒数")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回429的比例")
+    parser.add_argument("--rate-403", type=float, default=0.0, help="返回403的比例")
+    parser.add_argument("--rate-verify", type=float, default=0.0, help="重定向到验证页面的比例")
+    parser.add_argument("--retry-after", type=int, default=1, help="429响应的Retry-After秒数")
+    parser.add_argument("--seed", type=int, default=None, help="随机数种子，用于重现同样的故障序列")
+    args = parser.parse_args()
+
+    mock = MockProquest(args.fixtures or None, args.total, args.per_page, args.latency, args.jitter,
+                        args.rate_429, args.rate_403, args.rate_verify, args.retry_after, args.seed)
+    server = make_server(mock, port=args.port)
+    source = f"{len(mock.results_templates)} 个结果页和 {len(mock.detail_templates)} 个详情页模板" \
+        if mock.results_templates or mock.detail_templates else "生成的页面"
+    print(f"模拟服务器运行在 http://127.0.0.1:{server.server_port}，使用{source}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
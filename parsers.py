@@ -0,0 +1,191 @@
+import os
+import re
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+from log import get_logger
+
+logger = get_logger("parsers")
+
+# 可用的BeautifulSoup解析后端，按速度从快到慢排列
+try:
+    import lxml  # noqa: F401
+    AVAILABLE_PARSERS = ['lxml', 'html.parser']
+except ImportError:
+    AVAILABLE_PARSERS = ['html.parser']
+
+
+def choose_parser(name=None):
+    """选择解析后端，HTML_PARSER为auto或未设置时使用已安装的最快后端"""
+    name = name or os.getenv('HTML_PARSER', 'auto')
+    if name == 'auto':
+        return AVAILABLE_PARSERS[0]
+    if name not in AVAILABLE_PARSERS:
+        logger.warning("解析后端 %s 不可用，使用 %s", name, AVAILABLE_PARSERS[0])
+        return AVAILABLE_PARSERS[0]
+    return name
+
+
+HTML_PARSER = choose_parser()
+
+
+def make_soup(html_content, parser=None):
+    """把HTML解析为BeautifulSoup，传入已解析的soup时直接返回，保证每个页面只解析一次"""
+    if isinstance(html_content, BeautifulSoup):
+        return html_content
+    return BeautifulSoup(html_content, parser or HTML_PARSER)
+
+
+DOCVIEW_ID_RE = re.compile(r'/docview/(\d+)')
+RESULTS_COUNT_RE = re.compile(r'([\d,]+)')
+
+
+def _has_class(attrs, name):
+    return name in (attrs.get('class') or '').split()
+
+
+class ResultsPageParser(HTMLParser):
+    """基于事件的结果页解析器，不构建整棵文档树
+
+    逐个提取 li.resultItem 中的标题和文档ID；遇到验证码或"没有结果"提示时设置标记，
+    调用方可以立即停止输入剩余的内容。提取规则与BeautifulSoup版本一致：没有闭合的条目在下一个
+    li.resultItem 开始或所在的列表结束时结束，script和style中的文本不计入标题。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.items = []  # [(标题, 文档ID)]，没有标题元素时标题为None
+        self.captcha = False
+        self.no_results = False
+        self.count_texts = {}  # 总结果数所在元素的文本: {'h1': ..., 'div': ...}
+        self._item = None  # 当前条目: {'h3': [...], 'header': [...], 'id': ...}
+        self._li_depth = 0
+        self._list_depth = 0  # 当前打开的ul/ol层数
+        self._raw_tag = None  # 正在跳过内容的script或style
+        self._captures = []  # 正在收集文本的元素: [目标列表, 标签名, 同名标签的嵌套深度]
+        self._text = []  # 上一个标签之后收到的文本片段，分块输入时同一段文本可能分多次到达
+
+    @property
+    def stopped(self):
+        return self.captcha or self.no_results
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in ('script', 'style'):
+            self._raw_tag = tag
+            return
+        attrs = dict(attrs)
+        for capture in self._captures:
+            if capture[1] == tag:
+                capture[2] += 1
+
+        if tag == 'div':
+            if attrs.get('id') == 'captcha-container':
+                self.captcha = True
+            elif _has_class(attrs, 'noResults'):
+                self.no_results = True
+            elif _has_class(attrs, 'resultsCount') and 'div' not in self.count_texts:
+                self.count_texts['div'] = self._start_capture('div')
+        elif tag == 'h1' and attrs.get('id') == 'pqResultsCount' and 'h1' not in self.count_texts:
+            self.count_texts['h1'] = self._start_capture('h1')
+
+        if tag in ('ul', 'ol'):
+            self._list_depth += 1
+        if tag == 'li':
+            if _has_class(attrs, 'resultItem'):
+                # 上一个条目没有闭合时，同级的下一个条目开始即表示它已结束
+                if self._item is not None:
+                    self._finish_item()
+                self._item = {'h3': None, 'header': None, 'id': None, 'list_depth': self._list_depth}
+                self._li_depth = 1
+            elif self._item is not None:
+                self._li_depth += 1
+            return
+        if self._item is None:
+            return
+        if tag == 'a' and self._item['id'] is None:
+            match = DOCVIEW_ID_RE.search(attrs.get('href') or '')
+            if match:
+                self._item['id'] = match.group(1)
+        if tag == 'h3' and self._item['h3'] is None:
+            self._item['h3'] = self._start_capture('h3')
+        elif tag == 'div' and _has_class(attrs, 'resultHeader') and self._item['header'] is None:
+            self._item['header'] = self._start_capture('div')
+
+    def _start_capture(self, tag):
+        texts = []
+        self._captures.append([texts, tag, 1])
+        return texts
+
+    def handle_endtag(self, tag):
+        if tag == self._raw_tag:
+            self._raw_tag = None
+            self._text = []
+            return
+        self._flush_text()
+        for capture in self._captures:
+            if capture[1] == tag:
+                capture[2] -= 1
+        self._captures = [capture for capture in self._captures if capture[2] > 0]
+        if tag == 'li' and self._item is not None:
+            self._li_depth -= 1
+            if self._li_depth == 0:
+                self._finish_item()
+        elif tag in ('ul', 'ol'):
+            self._list_depth -= 1
+            # 条目所在的列表结束时，没有闭合的条目也随之结束
+            if self._item is not None and self._list_depth < self._item['list_depth']:
+                self._finish_item()
+
+    def handle_data(self, data):
+        if self._raw_tag is None:
+            self._text.append(data)
+
+    def handle_comment(self, data):
+        # 注释两侧是两段文本，与get_text(strip=True)一样分别去除空白
+        self._flush_text()
+
+    def _flush_text(self):
+        """把一段完整的文本去除两端空白后加入正在收集的元素"""
+        if not self._text:
+            return
+        data = ''.join(self._text).strip()
+        self._text = []
+        if not data:
+            return
+        for capture in self._captures:
+            capture[0].append(data)
+
+    def _finish_item(self):
+        item, self._item = self._item, None
+        # 条目内没有闭合的元素不再收集文本
+        self._captures = [capture for capture in self._captures
+                          if capture[0] is not item['h3'] and capture[0] is not item['header']]
+        title_parts = item['h3'] if item['h3'] is not None else item['header']
+        title = ''.join(title_parts) if title_parts is not None else None
+        self.items.append((title, item['id']))
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        # 没有闭合的最后一个条目
+        if self._item is not None:
+            self._finish_item()
+
+    def total_results(self):
+        """按h1#pqResultsCount、div.resultsCount的顺序取总结果数，找不到时返回0"""
+        for tag in ('h1', 'div'):
+            match = RESULTS_COUNT_RE.search(''.join(self.count_texts.get(tag, [])))
+            if match:
+                return int(match.group(1).replace(',', ''))
+        return 0
+
+
+def parse_results_stream(html_content, chunk_size=64 * 1024):
+    """分块输入结果页，遇到验证码或"没有结果"时立即停止，返回解析器"""
+    parser = ResultsPageParser()
+    for start in range(0, len(html_content), chunk_size):
+        parser.feed(html_content[start:start + chunk_size])
+        if parser.stopped:
+            return parser
+    parser.close()
+    return parser
@@ -0,0 +1,245 @@
+import os
+import time
+import heapq
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from retry import RetryableError, RetryState
+from metrics import REGISTRY
+from profiling import record_span
+from log import get_logger
+
+logger = get_logger("pipeline")
+
+PARSE_SECONDS = REGISTRY.histogram("proquest_parse_seconds", "解析进程中解析一个页面的耗时", ("page",))
+WRITE_SECONDS = REGISTRY.histogram("proquest_write_seconds", "写入线程保存一条结果的耗时")
+QUEUE_DEPTH = REGISTRY.gauge("proquest_pipeline_queue_depth", "流水线各阶段的队列长度", ("queue",))
+
+# 队列结束标记
+_STOP = object()
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def _start_method():
+    """解析进程的启动方式，默认forkserver（不支持时为spawn）
+
+    创建进程池时归档、指标、请求等线程已在运行，fork出的子进程可能继承被其他线程持有的锁而死锁，
+    因此不使用fork。可通过PARSE_START_METHOD配置。
+    """
+    method = os.getenv('PARSE_START_METHOD')
+    if method:
+        return method
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def parse_mp_context():
+    """解析进程使用的multiprocessing上下文，其他自建进程池的工具也使用它"""
+    return multiprocessing.get_context(_start_method())
+
+
+def get_parse_pool(max_workers=None):
+    """获取共享的解析进程池，进程数默认取CPU核数，可通过PARSE_PROCESSES配置"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            cpu_count = os.cpu_count() or 1
+            processes = int(os.getenv('PARSE_PROCESSES', min(max_workers or cpu_count, cpu_count)))
+            _parse_pool = ProcessPoolExecutor(max_workers=max(1, processes), mp_context=parse_mp_context())
+        return _parse_pool
+
+
+def reset_parse_pool(pool):
+    """解析进程意外退出后进程池不能再使用，丢弃它，下次获取时重新创建"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+            logger.warning("解析进程意外退出，重新创建解析进程池")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_parse(max_workers, func, *args):
+    """提交到共享的解析进程池，返回 (进程池, future)；进程池已损坏时换一个新的再提交"""
+    pool = get_parse_pool(max_workers)
+    try:
+        return pool, pool.submit(timed_call, func, *args)
+    except BrokenProcessPool:
+        reset_parse_pool(pool)
+        pool = get_parse_pool(max_workers)
+        return pool, pool.submit(timed_call, func, *args)
+
+
+def wait_parse(pool, future, max_workers, func, *args):
+    """等待解析结果，返回 (耗时, 结果)；解析进程意外退出时在新的进程池中重新解析一次"""
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        reset_parse_pool(pool)
+        return submit_parse(max_workers, func, *args)[1].result()
+
+
+def timed_call(func, *args):
+    """在解析进程中调用func，返回 (耗时, 结果)，由主进程记录耗时"""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def parse_in_pool(page, max_workers, func, *args):
+    """在共享的解析进程池中执行func并等待结果，page为页面类型（results或detail），用于统计解析耗时"""
+    pool, future = submit_parse(max_workers, func, *args)
+    parse_seconds, result = wait_parse(pool, future, max_workers, func, *args)
+    PARSE_SECONDS.observe(parse_seconds, page=page)
+    record_span("parse", parse_seconds)
+    return result
+
+
+class DetailPipeline:
+    """三段式流水线：请求线程池 -> 解析进程池 -> 单个写入线程
+
+    请求阶段只负责网络I/O，把原始HTML放入有界队列；解析在进程池中进行，避免与请求线程争用GIL；
+    所有写入都在同一个写入线程中完成。各阶段之间的队列有上限，下游处理不过来时上游会暂停，内存占用保持稳定。
+
+    fetch(item) 在请求线程中执行，返回 (原始HTML, 错误信息)，需要重试时抛出RetryableError；
+    parse(原始HTML, item) 在解析进程中执行，必须是模块级函数；
+    write(item, 解析结果) 在写入线程中执行。
+    """
+
+    def __init__(self, fetch, parse, write, retry_policy, fetch_workers=5, parse_workers=None,
+                 queue_size=32, on_retry=None, on_failed=None):
+        self.fetch = fetch
+        self.parse = parse
+        self.write = write
+        self.retry_policy = retry_policy
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.on_retry = on_retry
+        self.on_failed = on_failed
+        self._stop = threading.Event()
+        self._error = None
+
+    def _fail(self, error):
+        """记录第一个致命错误并通知各阶段停止"""
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _put(self, q, entry):
+        """向有界队列放入数据，流水线停止后不再等待"""
+        while not self._stop.is_set():
+            try:
+                q.put(entry, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _parse_stage(self, raw_queue, result_queue):
+        """从原始HTML队列取数据提交到解析进程池，按提交顺序把future交给写入线程"""
+        while True:
+            entry = raw_queue.get()
+            if entry is _STOP:
+                break
+            if self._stop.is_set():
+                continue
+            item, payload = entry
+            try:
+                pool, future = submit_parse(self.parse_workers, self.parse, payload, item)
+            except BaseException as e:
+                self._fail(e)
+                continue
+            self._put(result_queue, (item, payload, pool, future))
+        result_queue.put(_STOP)
+
+    def _write_stage(self, result_queue):
+        """等待解析结果并写入，出错后继续取出队列中的数据以免上游阻塞"""
+        while True:
+            entry = result_queue.get()
+            if entry is _STOP:
+                break
+            if self._stop.is_set():
+                continue
+            item, payload, pool, future = entry
+            try:
+                parse_seconds, result = wait_parse(pool, future, self.parse_workers, self.parse, payload, item)
+                PARSE_SECONDS.observe(parse_seconds, page="detail")
+                record_span("parse", parse_seconds)
+                with WRITE_SECONDS.time():
+                    self.write(item, result)
+            except BaseException as e:
+                self._fail(e)
+
+    def run(self, items):
+        """处理全部item，出现致命错误时在清理后重新抛出"""
+        raw_queue = queue.Queue(self.queue_size)
+        result_queue = queue.Queue(self.queue_size)
+        parse_thread = threading.Thread(target=self._parse_stage, args=(raw_queue, result_queue), daemon=True)
+        write_thread = threading.Thread(target=self._write_stage, args=(result_queue,), daemon=True)
+        parse_thread.start()
+        write_thread.start()
+
+        fetch_pool = ThreadPoolExecutor(max_workers=self.fetch_workers)
+        waiting = deque(items)
+        pending = {}
+        retry_states = {}
+        delayed = []  # 等待重试的item: (可重试的时间, 序号, item)
+        sequence = 0
+
+        try:
+            while (waiting or pending or delayed) and not self._stop.is_set():
+                # 退避时间已到的item重新排队
+                now = time.monotonic()
+                while delayed and delayed[0][0] <= now:
+                    waiting.appendleft(heapq.heappop(delayed)[2])
+
+                # 同时在途的请求不超过请求线程数
+                while waiting and len(pending) < self.fetch_workers:
+                    item = waiting.popleft()
+                    pending[fetch_pool.submit(self.fetch, item)] = item
+
+                timeout = max(0.0, delayed[0][0] - now) if delayed else None
+                if not pending:
+                    time.sleep(timeout)
+                    continue
+
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                QUEUE_DEPTH.set(len(pending), queue="fetching")
+                QUEUE_DEPTH.set(len(delayed), queue="retry")
+                QUEUE_DEPTH.set(raw_queue.qsize(), queue="parse")
+                QUEUE_DEPTH.set(result_queue.qsize(), queue="write")
+                for future in done:
+                    item = pending.pop(future)
+                    try:
+                        payload, error = future.result()
+                    except RetryableError as e:
+                        delay = self.retry_policy.next_delay(retry_states.setdefault(item, RetryState()), e)
+                        if delay is None:
+                            if self.on_failed:
+                                self.on_failed(item, f"{e}，重试次数过多")
+                        else:
+                            if self.on_retry:
+                                self.on_retry(item, e, delay)
+                            sequence += 1
+                            heapq.heappush(delayed, (time.monotonic() + delay, sequence, item))
+                        continue
+                    if error:
+                        if self.on_failed:
+                            self.on_failed(item, error)
+                        continue
+                    # 解析跟不上时在这里阻塞，不再发出新的请求
+                    self._put(raw_queue, (item, payload))
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            fetch_pool.shutdown(wait=True, cancel_futures=True)
+            raw_queue.put(_STOP)
+            parse_thread.join()
+            write_thread.join()
+
+        if self._error is not None:
+            raise self._error
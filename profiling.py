@@ -0,0 +1,227 @@
+import sys
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from log import get_logger
+
+logger = get_logger("profiling")
+
+# 当前的StageProfiler，没有开启--profile时为None，各处的span不产生任何开销
+_active = None
+
+
+class StageProfiler:
+    """按阶段统计耗时的分析器
+
+    span可以嵌套，路径按线程记录，例如 fetch/ratelimit_wait；已在其他地方测得的耗时
+    （如解析进程中的解析时间）通过record挂在当前路径下。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._samples = {}  # 路径 -> [秒]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name):
+        stack = self._stack()
+        stack.append(name)
+        path = "/".join(stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                self._samples.setdefault(path, []).append(elapsed)
+
+    def record(self, name, seconds):
+        path = "/".join(self._stack() + [name])
+        with self._lock:
+            self._samples.setdefault(path, []).append(seconds)
+
+    def summary(self):
+        """各路径的统计: [(路径, 次数, 总秒数, 平均, p50, p99, 最大)]，按路径排序以便显示为树"""
+        with self._lock:
+            samples = {path: sorted(values) for path, values in self._samples.items()}
+        rows = []
+        for path in sorted(samples):
+            values = samples[path]
+            count = len(values)
+            rows.append((path, count, sum(values), sum(values) / count, values[count // 2],
+                         values[min(count - 1, int(count * 0.99))], values[-1]))
+        return rows
+
+    def print_summary(self, out=None):
+        out = out or sys.stdout
+        wall = time.perf_counter() - self.started
+        print(f"\n各阶段耗时（墙钟时间 {wall:.2f} 秒；并发时各阶段的总秒数是多个线程之和，占比可以超过100%）", file=out)
+        print(f"{'阶段':<32}{'次数':>8}{'总秒数':>10}{'占比':>8}{'平均ms':>10}{'p50ms':>10}{'p99ms':>10}{'最大ms':>10}",
+              file=out)
+        for path, count, total, mean, p50, p99, longest in self.summary():
+            depth = path.count("/")
+            label = "  " * depth + path.rsplit("/", 1)[-1]
+            print(f"{label:<32}{count:>8}{total:>10.2f}{total / wall * 100:>7.1f}%{mean * 1000:>10.1f}"
+                  f"{p50 * 1000:>10.1f}{p99 * 1000:>10.1f}{longest * 1000:>10.1f}", file=out)
+
+    def write_folded(self, path):
+        """按folded stacks格式（flamegraph.pl、speedscope可以读取）写入各路径的自身耗时（微秒）"""
+        totals = {row[0]: row[2] for row in self.summary()}
+        with open(path, 'w', encoding='utf-8') as f:
+            for stage_path, total in totals.items():
+                children = sum(child_total for child_path, child_total in totals.items()
+                               if child_path.startswith(stage_path + "/") and "/" not in child_path[len(stage_path) + 1:])
+                self_time = max(0.0, total - children)
+                f.write(f"{stage_path.replace('/', ';')} {int(self_time * 1e6)}\n")
+
+
+@contextmanager
+def span(name):
+    """统计代码块的耗时，没有开启profile模式时什么也不做"""
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    with profiler.span(name):
+        yield
+
+
+def record_span(name, seconds):
+    """记录一段已测得的耗时"""
+    profiler = _active
+    if profiler is not None:
+        profiler.record(name, seconds)
+
+
+def instrument(target, stages):
+    """把模块（或对象）中的函数替换为在span中执行的版本: stages为 {函数名: 阶段名}
+
+    模块内部的调用在运行时按名称查找，替换后同样会被统计。被替换的函数仍可以传给进程池：
+    按名称序列化后，forkserver或spawn启动的解析进程重新导入模块，使用的是原函数；
+    PARSE_START_METHOD设为fork时子进程继承替换后的函数，其中的span不会被记录（子进程中没有开启profile）。
+    """
+    for attr, stage in stages.items():
+        func = getattr(target, attr)
+
+        @functools.wraps(func)
+        def wrapper(*args, _func=func, _stage=stage, **kwargs):
+            with span(_stage):
+                return _func(*args, **kwargs)
+        setattr(target, attr, wrapper)
+
+
+class ThreadedCProfile:
+    """cProfile只分析调用enable的线程，这里为每个新线程各创建一个分析器，结束时合并"""
+
+    def __init__(self):
+        import cProfile
+        self._cprofile = cProfile
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def _start_thread(self, *args):
+        sys.setprofile(None)
+        profile = self._cprofile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        threading.setprofile(self._start_thread)
+        self._start_thread()
+
+    def stop(self, path):
+        import pstats
+        threading.setprofile(None)
+        with self._lock:
+            profiles = list(self._profiles)
+        for profile in profiles:
+            profile.disable()
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+        stats.sort_stats('cumulative').print_stats(20)
+
+
+class ProfileSession:
+    """--profile模式的一次运行：开始时替换函数，结束时输出各阶段耗时，可选cProfile或pyinstrument的结果"""
+
+    def __init__(self, output=None, folded=None):
+        self.output = output
+        self.folded = folded
+        self.profiler = StageProfiler()
+        self._sampler = None
+
+    def start(self):
+        global _active
+        _active = self.profiler
+        if self.output and self.output.endswith('.html'):
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                logger.warning("没有安装pyinstrument，不生成 %s", self.output)
+            else:
+                # pyinstrument只采样启动它的线程（主线程）
+                self._sampler = Profiler()
+                self._sampler.start()
+        elif self.output:
+            self._sampler = ThreadedCProfile()
+            self._sampler.start()
+
+    def stop(self):
+        global _active
+        if self._sampler is not None:
+            if isinstance(self._sampler, ThreadedCProfile):
+                self._sampler.stop(self.output)
+            else:
+                self._sampler.stop()
+                with open(self.output, 'w', encoding='utf-8') as f:
+                    f.write(self._sampler.output_html())
+            logger.info("分析结果已保存到 %s", self.output)
+        _active = None
+        self.profiler.print_summary()
+        if self.folded:
+            self.profiler.write_folded(self.folded)
+            logger.info("火焰图数据已保存到 %s", self.folded)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def add_profile_arguments(parser):
+    """为命令行加入--profile相关参数"""
+    parser.add_argument("--profile", action="store_true", help="统计请求、解析、保存各阶段的耗时，结束时输出汇总")
+    parser.add_argument("--profile-output", help="同时保存函数级的分析结果: .prof为cProfile（全部线程），"
+                                                 ".html为pyinstrument（主线程，需要安装）")
+    parser.add_argument("--profile-folded", help="保存folded stacks格式的各阶段耗时，可用flamegraph.pl或speedscope生成火焰图")
+
+
+@contextmanager
+def profile_run(args, targets):
+    """按命令行参数决定是否开启profile模式，targets为 [(模块或对象, {函数名: 阶段名})]
+
+    targets也可以是返回该列表的函数，只在开启profile模式时调用，需要替换的对象不会被提前创建。
+    """
+    if not (args.profile or args.profile_output or args.profile_folded):
+        yield
+        return
+    if callable(targets):
+        targets = targets()
+    for target, stages in targets:
+        instrument(target, stages)
+    with ProfileSession(args.profile_output, args.profile_folded):
+        yield
@@ -0,0 +1,107 @@
+import os
+import time
+import threading
+from log import get_logger
+from metrics import REGISTRY
+from profiling import record_span
+
+logger = get_logger("rate_limiter")
+
+WAIT_SECONDS = REGISTRY.histogram("proquest_ratelimit_wait_seconds", "请求在限速器中等待令牌的时间",
+                                  buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+RATE = REGISTRY.gauge("proquest_ratelimit_rate", "限速器当前的每秒请求数")
+
+
+class RateLimiter:
+    """令牌桶限速器，两个爬虫共用
+
+    按AIMD方式调整速率：每interval秒内有正常的响应时加法增加一次速率，
+    遇到429或服务器错误时乘法降低速率并清空令牌桶。同一周期内并发的多个429
+    只降低一次速率，避免速率按2的N次方骤降。
+    """
+
+    def __init__(self, rate=1.0, burst=3, min_rate=0.05, max_rate=5.0, increase=0.02, decrease=0.5, interval=1.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.interval = interval
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._last_increase = self._updated
+        self._last_decrease = float('-inf')
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        RATE.set(rate)
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待，返回实际等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    WAIT_SECONDS.observe(waited)
+                    record_span("ratelimit_wait", waited)
+                    return waited
+                delay = max(self._paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def on_success(self):
+        """响应正常，每个周期最多加法增加一次速率，与响应的数量无关"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_increase < self.interval:
+                return
+            self._last_increase = now
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            RATE.set(self.rate)
+
+    def on_throttle(self, pause=None):
+        """被限流，乘法降低速率（每个周期最多一次），pause秒内不再发放令牌
+
+        pause通常来自响应的Retry-After头，为None时只清空令牌。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = 0.0
+            self._paused_until = max(self._paused_until, now + (pause or 0.0))
+            # 上次降低速率之前发出的请求返回的429不再重复降低
+            if now - self._last_decrease < self.interval:
+                return
+            self._last_decrease = now
+            self._last_increase = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            RATE.set(self.rate)
+            logger.warning("请求被限流，速率降低到 %.2f 次/秒", self.rate)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """获取共享的限速器，首次调用时根据.env配置创建"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                rate=float(os.getenv('RATE_LIMIT_RPS', 1.0)),
+                burst=int(os.getenv('RATE_LIMIT_BURST', 3)),
+                min_rate=float(os.getenv('RATE_LIMIT_MIN_RPS', 0.05)),
+                max_rate=float(os.getenv('RATE_LIMIT_MAX_RPS', 5.0)),
+                increase=float(os.getenv('RATE_LIMIT_INCREASE', 0.02)),
+                decrease=float(os.getenv('RATE_LIMIT_DECREASE', 0.5)),
+                interval=float(os.getenv('RATE_LIMIT_INTERVAL', 1.0)),
+            )
+        return _limiter
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from Proquest_crawler1 import extract_paper_data, save_page_results
+from Proquest_crawler2 import parse_detail_page, STORE, EXPORT_JSON, doc_id_from_details
+from state_db import get_crawl_state
+from doc_store import get_document_store
+from archive import get_archive, results_key, document_key
+from pipeline import parse_mp_context
+from log import get_logger
+
+logger = get_logger("reparse")
+
+
+def reparse_detail(args):
+    """在解析进程中重新解析一个详情页，返回 (论文ID, 详情记录, 错误信息)"""
+    paper_id, html_content = args
+    try:
+        return paper_id, parse_detail_page(html_content, paper_id), None
+    except ValueError as e:
+        return paper_id, None, str(e)
+
+
+def reparse_results(args):
+    """在解析进程中重新解析一个结果页，返回 (页码, 论文列表, 错误信息)"""
+    page, html_content = args
+    results, error = extract_paper_data(html_content)
+    return page, results, error
+
+
+def load_saved_html(key, legacy_path):
+    """优先从压缩归档读取页面，没有时读取旧版本直接保存的HTML文件"""
+    html_content = get_archive().get(key)
+    if html_content is None and os.path.exists(legacy_path):
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+    return html_content
+
+
+def list_id_pages(keyword):
+    """列出关键词的ID文件: [(页码, 文件路径)]，按页码排序"""
+    keyword_dir = os.path.join("data/data_id", keyword.replace(' ', '_'))
+    if not os.path.exists(keyword_dir):
+        return []
+    pages = []
+    for filename in os.listdir(keyword_dir):
+        page_match = re.search(r'(\d+)\.json$', filename)
+        if page_match:
+            pages.append((int(page_match.group(1)), os.path.join(keyword_dir, filename)))
+    return sorted(pages)
+
+
+def reparse_id_pages(keyword, pool, dry_run=False):
+    """用保存的结果页重新提取论文ID，返回ID有变化的页数
+
+    增量模式生成的页面由多个结果页中的新论文组成，没有对应的结果页HTML，不重新解析。
+    """
+    safe_keyword = keyword.replace(' ', '_')
+    delta_pages = get_crawl_state().delta_pages(keyword)
+    tasks = []
+    old_pages = {}
+    skipped = 0
+    for page, filepath in list_id_pages(keyword):
+        if page in delta_pages:
+            skipped += 1
+            continue
+        html_content = load_saved_html(results_key(keyword, page),
+                                       os.path.join("debug_html", f"{safe_keyword}_page_{page}.html"))
+        if html_content is None:
+            continue
+        with open(filepath, 'r', encoding='utf-8') as f:
+            old_pages[page] = json.load(f)
+        tasks.append((page, html_content))
+
+    changed = 0
+    for page, results, error in pool.map(reparse_results, tasks, chunksize=4):
+        if error or results is None:
+            logger.warning("第 %d 页结果页重新解析失败: %s", page, error)
+            continue
+        if results != old_pages[page]:
+            changed += 1
+            if not dry_run:
+                save_page_results(keyword, page, results)
+    print(f"重新解析 {len(tasks)} 个结果页，其中 {changed} 页的论文ID有变化，跳过增量页面 {skipped} 个")
+    return changed
+
+
+def reparse_keyword(keyword, processes=None, dry_run=False, with_ids=False):
+    """用保存的HTML重新生成关键词的论文详情，不发送任何网络请求"""
+    safe_keyword = keyword.replace(' ', '_')
+    stats = {"total": 0, "changed": 0, "new": 0, "missing_html": 0, "failed": 0}
+
+    # 归档的后台写入线程已在运行，不能用fork启动解析进程，与爬虫的解析进程池使用相同的启动方式
+    with ProcessPoolExecutor(max_workers=processes, mp_context=parse_mp_context()) as pool:
+        if with_ids:
+            reparse_id_pages(keyword, pool, dry_run)
+
+        for page, filepath in list_id_pages(keyword):
+            with open(filepath, 'r', encoding='utf-8') as f:
+                paper_ids = [paper["id"] for paper in json.load(f) if "id" in paper]
+
+            tasks = []
+            for paper_id in paper_ids:
+                html_content = load_saved_html(document_key(paper_id),
+                                               os.path.join("debug_html", safe_keyword, f"{paper_id}.html"))
+                if html_content is None:
+                    stats["missing_html"] += 1
+                else:
+                    tasks.append((paper_id, html_content))
+            if not tasks:
+                continue
+
+            old_records = {doc_id_from_details(d): d for d in STORE.read_page(keyword, page)}
+            new_records = dict(old_records)
+            for paper_id, record, error in pool.map(reparse_detail, tasks, chunksize=8):
+                stats["total"] += 1
+                if error:
+                    stats["failed"] += 1
+                    logger.warning("论文 %s 重新解析失败: %s", paper_id, error)
+                    continue
+                old_record = old_records.get(paper_id)
+                if old_record is None:
+                    stats["new"] += 1
+                elif old_record != record:
+                    stats["changed"] += 1
+                new_records[paper_id] = record
+
+            if not dry_run and new_records != old_records:
+                # 保持原有记录的顺序，新增的记录放在最后
+                ordered = [new_records[doc_id] for doc_id in old_records] + \
+                          [record for doc_id, record in new_records.items() if doc_id not in old_records]
+                STORE.rewrite_page(keyword, page, ordered)
+                # 共享详情存储中的记录同样更新，其他关键词生成详情文件时使用新的解析结果
+                for doc_id, record in new_records.items():
+                    if old_records.get(doc_id) != record:
+                        get_document_store().put(doc_id, record)
+                get_document_store().flush()
+                get_crawl_state().mark_saved(keyword, page, [doc_id for doc_id in new_records if doc_id not in old_records])
+                if EXPORT_JSON:
+                    STORE.finalize_page(keyword, page)
+            logger.info("第 %d 页重新解析 %d 篇论文", page, len(tasks))
+
+    print(f"重新解析完成: 共 {stats['total']} 篇，变化 {stats['changed']} 篇，新增 {stats['new']} 篇，"
+          f"解析失败 {stats['failed']} 篇，缺少HTML {stats['missing_html']} 篇")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用保存的HTML离线重新解析论文数据")
+    parser.add_argument("keyword", help="要重新解析的关键词")
+    parser.add_argument("--processes", type=int, default=None, help="解析进程数，默认使用全部CPU核")
+    parser.add_argument("--dry-run", action="store_true", help="只统计变化，不写入文件")
+    parser.add_argument("--ids", action="store_true", help="同时用保存的结果页重新提取论文ID")
+    args = parser.parse_args()
+    reparse_keyword(args.keyword, args.processes, args.dry_run, args.ids)
+
+
+if __name__ == "__main__":
+    main()
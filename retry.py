@@ -0,0 +1,117 @@
+import os
+import time
+import random
+from email.utils import parsedate_to_datetime
+from log import get_logger
+from metrics import REGISTRY
+
+logger = get_logger("retry")
+
+RETRIES = REGISTRY.counter("proquest_retries_total", "按错误类别统计的重试次数", ("kind",))
+GIVE_UPS = REGISTRY.counter("proquest_retry_exhausted_total", "超出重试次数后放弃的请求数", ("kind",))
+
+# 可重试的错误类别
+NETWORK = "network"  # 连接失败、超时等网络错误
+THROTTLED = "throttled"  # 429请求过于频繁
+SERVER_ERROR = "server_error"  # 5xx服务器错误
+FORBIDDEN = "forbidden"  # 403，通常是Cookie失效
+
+
+class RetryableError(Exception):
+    """可以重试的请求错误，kind为错误类别，retry_after为服务器要求的等待秒数"""
+
+    def __init__(self, kind, message, retry_after=None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+class RetryState:
+    """单个请求的重试记录"""
+
+    def __init__(self):
+        self.attempts = {}
+        self.total = 0
+
+
+def parse_retry_after(response):
+    """解析Retry-After响应头，支持秒数和HTTP日期两种格式"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_status(status_code):
+    """根据状态码判断错误类别，不需要重试时返回None"""
+    if status_code == 403:
+        return FORBIDDEN
+    if status_code == 429:
+        return THROTTLED
+    if 500 <= status_code < 600:
+        return SERVER_ERROR
+    return None
+
+
+class RetryPolicy:
+    """指数退避加随机抖动的重试策略，每类错误单独计算重试次数"""
+
+    def __init__(self, budgets, max_total=7, base_delay=1.0, max_delay=60.0, jitter=0.5):
+        self.budgets = budgets
+        self.max_total = max_total
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def next_delay(self, state, error):
+        """记录一次失败并返回下次重试前的等待秒数，超出重试次数时返回None"""
+        attempts = state.attempts.get(error.kind, 0) + 1
+        state.attempts[error.kind] = attempts
+        state.total += 1
+        if attempts > self.budgets.get(error.kind, 0) or state.total > self.max_total:
+            GIVE_UPS.inc(kind=error.kind)
+            return None
+        RETRIES.inc(kind=error.kind)
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        delay *= 1 - self.jitter + random.random() * self.jitter
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+        return delay
+
+    def call(self, attempt, *args):
+        """循环调用attempt直到成功或放弃，attempt通过抛出RetryableError表示需要重试"""
+        state = RetryState()
+        while True:
+            try:
+                return attempt(*args)
+            except RetryableError as e:
+                delay = self.next_delay(state, e)
+                if delay is None:
+                    logger.error("%s，重试次数过多", e)
+                    return None, "重试次数过多"
+                logger.warning("%s，%.1f 秒后重试", e, delay)
+                time.sleep(delay)
+
+
+def init_retry_policy(max_retry_count):
+    """根据.env配置创建重试策略，MAX_RETRY_COUNT作为总重试次数上限"""
+    budgets = {
+        NETWORK: int(os.getenv('RETRY_BUDGET_NETWORK', 5)),
+        THROTTLED: int(os.getenv('RETRY_BUDGET_THROTTLED', max_retry_count)),
+        SERVER_ERROR: int(os.getenv('RETRY_BUDGET_SERVER_ERROR', 5)),
+        FORBIDDEN: int(os.getenv('RETRY_BUDGET_FORBIDDEN', 2)),
+    }
+    return RetryPolicy(
+        budgets,
+        max_total=max_retry_count,
+        base_delay=float(os.getenv('RETRY_BASE_DELAY', 1.0)),
+        max_delay=float(os.getenv('RETRY_MAX_DELAY', 60.0)),
+    )
@@ -0,0 +1,105 @@
+import time
+import heapq
+import threading
+
+
+class FairScheduler:
+    """多个关键词共用的优先级工作队列
+
+    每个关键词有自己的任务队列，取任务时按步幅调度（stride scheduling）选出已获得份额最少的关键词，
+    优先级为2的关键词得到的请求数是优先级为1的两倍。同一关键词内order小的任务先执行，
+    需要重试的任务按退避时间延后放回，不占用工作线程。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queues = {}  # 关键词 -> [(order, 序号, 任务)]
+        self._weights = {}
+        self._pass = {}  # 关键词已获得的份额，每取出一个任务增加 1/优先级
+        self._vtime = 0.0  # 最近一次取出任务的关键词的份额
+        self._delayed = []  # 等待重试的任务: (可执行的时间, 序号, 关键词, order, 任务)
+        self._sequence = 0
+        self._active = 0  # 正在执行的任务数
+        self._closed = False
+
+    def add_key(self, key, priority=1):
+        """登记一个关键词及其优先级"""
+        with self._cond:
+            self._queues.setdefault(key, [])
+            self._weights[key] = max(float(priority), 0.01)
+            self._pass.setdefault(key, self._vtime)
+
+    def _push(self, key, order, task):
+        queue = self._queues.setdefault(key, [])
+        if not queue:
+            # 空闲过的关键词不能攒下份额，回来后与其他关键词从同一位置开始
+            self._pass[key] = max(self._pass.get(key, 0.0), self._vtime)
+        self._sequence += 1
+        heapq.heappush(queue, (order, self._sequence, task))
+
+    def put(self, key, task, order=0, delay=0):
+        """加入一个任务，delay秒之后才能被取出"""
+        with self._cond:
+            if delay > 0:
+                self._sequence += 1
+                heapq.heappush(self._delayed, (time.monotonic() + delay, self._sequence, key, order, task))
+            else:
+                self._push(key, order, task)
+            self._cond.notify_all()
+
+    def get(self):
+        """取出下一个任务: (关键词, 任务)，所有任务都已完成或调度器关闭时返回None"""
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, key, order, task = heapq.heappop(self._delayed)
+                    self._push(key, order, task)
+
+                ready = [key for key, queue in self._queues.items() if queue]
+                if ready:
+                    key = min(ready, key=lambda k: self._pass[k])
+                    _, _, task = heapq.heappop(self._queues[key])
+                    self._vtime = self._pass[key]
+                    self._pass[key] += 1 / self._weights.get(key, 1.0)
+                    self._active += 1
+                    return key, task
+
+                if not self._delayed and not self._active:
+                    break
+                timeout = max(0.0, self._delayed[0][0] - now) if self._delayed else None
+                self._cond.wait(timeout)
+            self._cond.notify_all()
+            return None
+
+    def task_done(self):
+        """工作线程执行完一个任务后调用"""
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def drop(self, key, predicate):
+        """丢弃关键词中尚未执行且满足predicate(任务)的任务，返回丢弃的数量"""
+        with self._cond:
+            queue = self._queues.get(key, [])
+            kept = [entry for entry in queue if not predicate(entry[2])]
+            dropped = len(queue) - len(kept)
+            heapq.heapify(kept)
+            self._queues[key] = kept
+            delayed = [entry for entry in self._delayed if entry[2] != key or not predicate(entry[4])]
+            dropped += len(self._delayed) - len(delayed)
+            heapq.heapify(delayed)
+            self._delayed = delayed
+            self._cond.notify_all()
+            return dropped
+
+    def pending(self, key):
+        """关键词尚未执行的任务数"""
+        with self._cond:
+            return len(self._queues.get(key, [])) + sum(1 for entry in self._delayed if entry[2] == key)
+
+    def close(self):
+        """停止调度，等待中的工作线程立即返回"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
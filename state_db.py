@@ -0,0 +1,199 @@
+import os
+import time
+import sqlite3
+import threading
+
+# 论文状态
+PENDING = "pending"  # 已从结果页获得ID，尚未请求详情
+FETCHED = "fetched"  # 已获取详情页HTML
+PARSED = "parsed"  # 已解析并保存详情
+FAILED = "failed"  # 重试后仍然失败
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    keyword TEXT,
+    page INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents(status);
+
+CREATE TABLE IF NOT EXISTS keyword_documents (
+    keyword TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    saved INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (keyword, doc_id)
+);
+CREATE INDEX IF NOT EXISTS idx_keyword_documents_saved ON keyword_documents(keyword, saved);
+
+CREATE TABLE IF NOT EXISTS delta_pages (
+    keyword TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    PRIMARY KEY (keyword, page)
+);
+
+CREATE TABLE IF NOT EXISTS progress (
+    keyword TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    current_page INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (keyword, stage)
+);
+"""
+
+
+class CrawlState:
+    """持久化的爬取状态，按论文ID记录状态、重试次数和错误信息
+
+    documents表记录每篇论文的全局状态，keyword_documents表记录论文属于哪些关键词
+    以及是否已写入该关键词的详情文件，delta_pages表记录增量模式生成的页面，progress表记录各阶段处理到的页码。
+    """
+
+    def __init__(self, path="data/crawl_state.db"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def register_ids(self, keyword, page, doc_ids):
+        """记录结果页中的论文ID，已存在的ID保持原状态"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO documents (doc_id, created_at, updated_at) VALUES (?, ?, ?)",
+                [(doc_id, now, now) for doc_id in doc_ids])
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO keyword_documents (keyword, doc_id, page) VALUES (?, ?, ?)",
+                [(keyword, doc_id, page) for doc_id in doc_ids])
+
+    def mark_fetched(self, doc_id):
+        self._update(doc_id, "status = ?, attempts = attempts + 1, last_error = NULL", (FETCHED,))
+
+    def record_error(self, doc_id, error):
+        """记录一次失败的请求，论文仍在重试中"""
+        self._update(doc_id, "attempts = attempts + 1, last_error = ?", (str(error),))
+
+    def mark_failed(self, doc_id, error):
+        self._update(doc_id, "status = ?, attempts = attempts + 1, last_error = ?", (FAILED, str(error)))
+
+    def mark_saved(self, keyword, page, doc_ids, parsed=True):
+        """记录一批论文已写入该关键词第page页的详情文件
+
+        parsed为True表示论文是在这里解析的，同时把documents表中的状态更新为已解析；
+        共享详情存储中已有的论文只更新keyword_documents表。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO keyword_documents (keyword, doc_id, page, saved) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (keyword, doc_id) DO UPDATE SET saved = 1",
+                [(keyword, doc_id, page) for doc_id in doc_ids])
+            if parsed:
+                self._conn.executemany(
+                    "INSERT INTO documents (doc_id, status, keyword, page, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (doc_id) DO UPDATE SET "
+                    "status = excluded.status, keyword = excluded.keyword, page = excluded.page, "
+                    "updated_at = excluded.updated_at",
+                    [(doc_id, PARSED, keyword, page, now, now) for doc_id in doc_ids])
+
+    def _update(self, doc_id, assignments, params):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO documents (doc_id, created_at, updated_at) VALUES (?, ?, ?)",
+                (doc_id, now, now))
+            self._conn.execute(
+                f"UPDATE documents SET {assignments}, updated_at = ? WHERE doc_id = ?",
+                (*params, now, doc_id))
+
+    def saved_ids(self, keyword):
+        """返回已写入该关键词详情文件的全部论文ID"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM keyword_documents WHERE keyword = ? AND saved = 1", (keyword,)).fetchall()
+        return {row[0] for row in rows}
+
+    def known_ids(self, keyword):
+        """返回该关键词在结果页中出现过的全部论文ID"""
+        with self._lock:
+            rows = self._conn.execute("SELECT doc_id FROM keyword_documents WHERE keyword = ?", (keyword,)).fetchall()
+        return {row[0] for row in rows}
+
+    def page_ids(self, keyword, page):
+        """返回已保存到该关键词第page页的论文ID，按登记的顺序"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM keyword_documents WHERE keyword = ? AND page = ? AND saved = 1 ORDER BY rowid",
+                (keyword, page)).fetchall()
+        return [row[0] for row in rows]
+
+    def max_page(self, keyword):
+        """返回该关键词已登记的最大页码，没有记录时返回0"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(page) FROM keyword_documents WHERE keyword = ?", (keyword,)).fetchone()
+        return row[0] or 0
+
+    def parsed_locations(self, doc_ids):
+        """返回已在其他地方解析过的论文及其详情记录位置: {论文ID: (关键词, 页码)}"""
+        locations = {}
+        doc_ids = list(doc_ids)
+        with self._lock:
+            for i in range(0, len(doc_ids), 500):
+                chunk = doc_ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT doc_id, keyword, page FROM documents WHERE status = ? "
+                    f"AND doc_id IN ({','.join('?' * len(chunk))})", (PARSED, *chunk)).fetchall()
+                for doc_id, keyword, page in rows:
+                    locations[doc_id] = (keyword, page)
+        return locations
+
+    def mark_delta_page(self, keyword, page, delta=True):
+        """记录该页是否由增量模式生成，这种页面的论文来自多个结果页，没有对应的结果页HTML"""
+        with self._lock, self._conn:
+            if delta:
+                self._conn.execute("INSERT OR IGNORE INTO delta_pages (keyword, page) VALUES (?, ?)", (keyword, page))
+            else:
+                self._conn.execute("DELETE FROM delta_pages WHERE keyword = ? AND page = ?", (keyword, page))
+
+    def delta_pages(self, keyword):
+        """返回该关键词由增量模式生成的页码"""
+        with self._lock:
+            rows = self._conn.execute("SELECT page FROM delta_pages WHERE keyword = ?", (keyword,)).fetchall()
+        return {row[0] for row in rows}
+
+    def get_progress(self, keyword, stage):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT current_page FROM progress WHERE keyword = ? AND stage = ?", (keyword, stage)).fetchone()
+        return row[0] if row else None
+
+    def set_progress(self, keyword, stage, current_page):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO progress (keyword, stage, current_page, updated_at) VALUES (?, ?, ?, ?)",
+                (keyword, stage, current_page, time.time()))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_crawl_state():
+    """获取共享的爬取状态数据库，路径可通过CRAWL_STATE_DB配置"""
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = CrawlState(os.getenv('CRAWL_STATE_DB', 'data/crawl_state.db'))
+        return _state
@@ -0,0 +1,112 @@
+import os
+import json
+import threading
+from log import get_logger
+
+logger = get_logger("storage")
+
+
+class DetailsStore:
+    """各关键词的论文详情文件
+
+    每页对应一个 <关键词><页码>.jsonl 文件，每篇论文一行，由共享详情存储中的记录整体生成，
+    先写临时文件再原子替换，fsync为True时替换前同步到磁盘。
+    finalize_page 会把一页的记录原子地导出为旧格式的 <关键词><页码>.json。
+    batch_size为爬取时每保存多少篇论文在状态数据库中批量标记一次。
+    """
+
+    def __init__(self, base_dir="data/data_details", batch_size=20, fsync=True):
+        self.base_dir = base_dir
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+    def page_path(self, keyword, page, ext=".jsonl"):
+        safe_keyword = keyword.replace(' ', '_')
+        return os.path.join(self.base_dir, safe_keyword, f"{safe_keyword}{page}{ext}")
+
+    def _migrate_legacy(self, keyword, page):
+        """旧版本只写了JSON文件时，先转换为JSONL，之后以JSONL为准"""
+        path = self.page_path(keyword, page)
+        legacy_path = self.page_path(keyword, page, ".json")
+        if os.path.exists(path) or not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except Exception as e:
+            logger.warning("读取旧版详情文件 %s 时出错: %s", legacy_path, e)
+            return
+        self._write_lines(path, records)
+
+    def _write_lines(self, path, records):
+        """把记录逐行写入临时文件后原子替换path"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def read_page(self, keyword, page):
+        """读取一页已保存的全部论文详情"""
+        with self._lock:
+            self._migrate_legacy(keyword, page)
+        return self.read_file(self.page_path(keyword, page))
+
+    def existing_page_path(self, keyword, page):
+        """该页实际存在的详情文件，同时有JSONL和JSON时以JSONL为准，都没有时返回None"""
+        for ext in (".jsonl", ".json"):
+            path = self.page_path(keyword, page, ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def read_file(self, path):
+        """读取一个详情文件（JSONL或旧版的JSON），不做格式转换，只读取数据的工具使用"""
+        records = []
+        if not path or not os.path.exists(path):
+            return records
+        if path.endswith(".json"):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 中断时可能留下不完整的最后一行，直接跳过
+                    logger.warning("跳过 %s 中不完整的记录", path)
+        return records
+
+    def rewrite_page(self, keyword, page, records):
+        """用新的记录整体替换一页的JSONL文件，先写临时文件再原子替换"""
+        with self._lock:
+            path = self.page_path(keyword, page)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write_lines(path, records)
+
+    def finalize_page(self, keyword, page):
+        """把一页的记录导出为JSON文件，先写临时文件再原子替换"""
+        records = self.read_page(keyword, page)
+        if not records:
+            return None
+        filename = self.page_path(keyword, page, ".json")
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+        return filename
+
+
+def init_details_store():
+    """根据.env配置创建论文详情存储"""
+    return DetailsStore(
+        batch_size=int(os.getenv('DETAILS_BATCH_SIZE', 20)),
+        fsync=os.getenv('DETAILS_FSYNC', '1').lower() not in ('0', 'false', 'no'),
+    )
@@ -0,0 +1,38 @@
+import os
+import json
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from storage import DetailsStore
+from export_parquet import ParquetExporter, load_details
+
+
+def record(doc_id, year="2020"):
+    return {"Title": f"T{doc_id}", "Document URL": f"https://www.proquest.com/docview/{doc_id}/abstract",
+            "Publication Year": year, "subject": ["A", "B"]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DetailsStore(str(tmp_path / "details"), fsync=False)
+    store.rewrite_page("Kw A", 1, [record("1"), record("2", "")])
+    # 旧版本只有JSON文件的页面
+    os.makedirs(os.path.dirname(store.page_path("Kw A", 2)), exist_ok=True)
+    with open(store.page_path("Kw A", 2, ".json"), 'w', encoding='utf-8') as f:
+        json.dump([record("3", "2019")], f)
+    return store
+
+
+def test_incremental_export_skips_unchanged_pages(tmp_path, store):
+    out_dir = str(tmp_path / "parquet")
+    assert ParquetExporter(out_dir, store).export_keyword("Kw A") == (2, 3)
+    # 导出只读取数据，不把旧版JSON转换为JSONL
+    assert not os.path.exists(store.page_path("Kw A", 2))
+    assert ParquetExporter(out_dir, store).export_keyword("Kw A") == (0, 0)
+
+    store.rewrite_page("Kw A", 1, [record("1", "2021")])
+    assert ParquetExporter(out_dir, store).export_keyword("Kw A") == (1, 1)
+    table = load_details(out_dir, "Kw A")
+    assert sorted(table["doc_id"].to_pylist()) == ["1", "3"]
+    assert sorted(table["year"].to_pylist()) == [2019, 2021]
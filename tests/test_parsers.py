@@ -0,0 +1,38 @@
+import pytest
+from parsers import AVAILABLE_PARSERS, make_soup, parse_results_stream
+from Proquest_crawler1 import extract_paper_data, extract_total_results, results_from_parser
+
+
+def item(doc_id, title, closed=True):
+    html = (f'<li class="resultItem"><div class="resultHeader"><h3>'
+            f'<a href="/docview/{doc_id}/abstract">{title}</a></h3></div>')
+    return html + ('</li>' if closed else '')
+
+
+def page(*items):
+    return (f'<html><body><h1 id="pqResultsCount">1,234 results</h1>'
+            f'<ul class="resultItems">{"".join(items)}</ul><div class="footer"><h3>页脚</h3></div></body></html>')
+
+
+FIXTURES = {
+    "normal": page(item("1", "Deep  learn<b>ing</b> for x"), item("2", "Second")),
+    "unclosed": page(item("1", "First", closed=False), item("2", "Second", closed=False)),
+    "script": page(item("1", "<script>var a = '<b>1</b>';</script>Title<style>b {}</style>")),
+    "comment": page(item("1", "A <!-- note --> B")),
+    "nested_list": page('<li class="resultItem"><h3><a href="/docview/1/abstract">T</a></h3>'
+                        '<ul><li>sub</li><li>sub2</li></ul></li>', item("2", "U")),
+    "header_only": page('<li class="resultItem"><div class="resultHeader">Header &amp; more'
+                        '<a href="/docview/7/abstract">link</a></div></li>'),
+    "no_results": '<html><body><div class="noResults">没有结果</div></body></html>',
+}
+
+
+@pytest.mark.parametrize("parser", AVAILABLE_PARSERS)
+@pytest.mark.parametrize("name", sorted(FIXTURES))
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+def test_stream_parser_matches_soup(name, parser, chunk_size):
+    html = FIXTURES[name]
+    expected = extract_paper_data(make_soup(html, parser))
+    stream = parse_results_stream(html, chunk_size)
+    assert results_from_parser(stream) == expected
+    assert stream.total_results() == extract_total_results(make_soup(html, parser))
@@ -0,0 +1,71 @@
+import pytest
+from work_queue import SqliteWorkQueue, QUEUED, LEASED, DONE, FAILED
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / "work_queue.db"), max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_lease_and_complete(queue):
+    assert queue.enqueue("K", 1, ["1", "2"]) == 2
+    assert queue.enqueue("K", 1, ["1", "2"]) == 0
+    assert queue.lease("w1", 10, 60) == [("1", "K", 1), ("2", "K", 1)]
+    # 租约有效期内不会分配给其他节点
+    assert queue.lease("w2", 10, 60) == []
+    assert queue.complete("w1", "1", '{"title": "T"}')
+    assert not queue.complete("w2", "2", "{}")
+    assert queue.counts() == {DONE: 1, LEASED: 1}
+    assert queue.collect() == [("1", "K", 1, '{"title": "T"}')]
+
+
+def test_expired_lease_is_released_to_other_worker(queue):
+    queue.enqueue("K", 1, ["1"])
+    assert queue.lease("w1", 10, -1) == [("1", "K", 1)]
+    assert queue.lease("w2", 10, 60) == [("1", "K", 1)]
+    # 原节点的租约已被接手，提交的结果不再接受
+    assert not queue.complete("w1", "1", "{}")
+    assert queue.complete("w2", "1", "{}")
+
+
+def test_expired_lease_over_budget_is_failed(queue):
+    queue.enqueue("K", 1, ["1"])
+    assert queue.lease("w1", 10, -1)
+    assert queue.lease("w2", 10, -1)
+    # 两次尝试都在处理时租约过期，不再分配
+    assert queue.lease("w3", 10, 60) == []
+    assert queue.counts() == {FAILED: 1}
+    assert queue.failed()[0][:3] == ("1", "K", 1)
+
+
+def test_fail_retries_until_max_attempts(queue):
+    queue.enqueue("K", 1, ["1"])
+    queue.lease("w1", 10, 60)
+    queue.fail("w1", "1", "HTTP 500")
+    assert queue.counts() == {QUEUED: 1}
+    queue.lease("w1", 10, 60)
+    queue.fail("w1", "1", "HTTP 500")
+    assert queue.counts() == {FAILED: 1}
+    assert queue.failed() == [("1", "K", 1, "HTTP 500")]
+
+
+def test_release_does_not_count_attempt(queue):
+    queue.enqueue("K", 1, ["1"])
+    for _ in range(3):
+        assert queue.lease("w1", 10, 60)
+        queue.release("w1", ["1"])
+    assert queue.counts() == {QUEUED: 1}
+
+
+def test_enqueue_requeues_failed(queue):
+    queue.enqueue("K", 1, ["1"])
+    queue.lease("w1", 10, 60)
+    queue.fail("w1", "1", "HTTP 404", retry=False)
+    assert queue.counts() == {FAILED: 1}
+    # 协调节点下次运行时重新加入，失败的论文重新排队并有完整的尝试次数
+    assert queue.enqueue("K", 1, ["1"]) == 1
+    assert queue.lease("w1", 10, 60) == [("1", "K", 1)]
+    queue.fail("w1", "1", "HTTP 500")
+    assert queue.counts() == {QUEUED: 1}
@@ -0,0 +1,176 @@
+import os
+import time
+import sqlite3
+import threading
+
+# 任务状态
+QUEUED = "queued"  # 等待租用
+LEASED = "leased"  # 已被某个节点租用
+DONE = "done"  # 节点已返回解析结果，等待协调节点保存
+COLLECTED = "collected"  # 协调节点已保存结果
+FAILED = "failed"  # 重试后仍然失败
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    doc_id TEXT PRIMARY KEY,
+    keyword TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, lease_until);
+"""
+
+
+class SqliteWorkQueue:
+    """基于SQLite的租约工作队列，多个节点通过共享的数据库文件分配论文ID
+
+    节点租用一批论文ID后需要在租约到期前续租，节点退出或崩溃后租约过期，论文ID会被其他节点重新租用。
+    节点提交的解析结果保存在队列中，由协调节点统一写入详情文件。
+    """
+
+    def __init__(self, path="data/work_queue.db", max_attempts=3):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_attempts = max_attempts
+        # 多个进程同时写入时等待锁，而不是立即报错
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _transaction(self, work):
+        """在写事务中执行work(conn)，BEGIN IMMEDIATE保证多个进程不会租到同一篇论文"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, keyword, page, doc_ids):
+        """加入待爬取的论文ID，返回新加入的数量
+
+        等待中或处理中的论文保持原状态；以前失败或已收集的论文再次加入时重新排队，尝试次数清零。
+        """
+        now = time.time()
+        rows = [(doc_id, keyword, page, now) for doc_id in doc_ids]
+
+        def work(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (doc_id, keyword, page, updated_at) VALUES (?, ?, ?, ?)", rows)
+            conn.executemany(
+                "UPDATE tasks SET status = ?, keyword = ?, page = ?, worker = NULL, lease_until = NULL, attempts = 0, "
+                "last_error = NULL, result = NULL, updated_at = ? WHERE doc_id = ? AND status IN (?, ?)",
+                [(QUEUED, keyword, page, now, doc_id, FAILED, COLLECTED) for doc_id in doc_ids])
+            return conn.total_changes - before
+        return self._transaction(work)
+
+    def lease(self, worker, count, ttl):
+        """租用最多count篇论文，包括租约已过期的论文，返回 [(论文ID, 关键词, 页码)]
+
+        租约过期说明节点在处理时崩溃或退出，已用完max_attempts次尝试的论文不再分配，直接标记为失败，
+        避免一篇导致节点崩溃的论文被无限重试。
+        """
+        def work(conn):
+            now = time.time()
+            conn.execute(
+                "UPDATE tasks SET status = ?, last_error = COALESCE(last_error, ?), worker = NULL, lease_until = NULL, "
+                "updated_at = ? WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "租约多次过期", now, LEASED, now, self.max_attempts))
+            rows = conn.execute(
+                "SELECT doc_id, keyword, page FROM tasks WHERE status = ? OR (status = ? AND lease_until < ?) "
+                "ORDER BY keyword, page LIMIT ?", (QUEUED, LEASED, now, count)).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE doc_id = ?", [(LEASED, worker, now + ttl, now, row[0]) for row in rows])
+            return rows
+        return self._transaction(work)
+
+    def renew(self, worker, doc_ids, ttl):
+        """延长租约，返回仍由该节点持有的论文数"""
+        def work(conn):
+            now = time.time()
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE doc_id = ? AND status = ? AND worker = ?",
+                [(now + ttl, now, doc_id, LEASED, worker) for doc_id in doc_ids])
+            return conn.total_changes - before
+        return self._transaction(work)
+
+    def complete(self, worker, doc_id, result):
+        """提交解析结果（JSON字符串），租约已被其他节点接手时返回False"""
+        def work(conn):
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, lease_until = NULL, updated_at = ? "
+                "WHERE doc_id = ? AND status = ? AND worker = ?", (DONE, result, time.time(), doc_id, LEASED, worker))
+            return cursor.rowcount > 0
+        return self._transaction(work)
+
+    def fail(self, worker, doc_id, error, retry=True):
+        """报告失败，retry为True且未超过最大次数时放回队列"""
+        def work(conn):
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN ? AND attempts < ? THEN ? ELSE ? END, "
+                "last_error = ?, lease_until = NULL, updated_at = ? WHERE doc_id = ? AND status = ? AND worker = ?",
+                (int(retry), self.max_attempts, QUEUED, FAILED, error, time.time(), doc_id, LEASED, worker))
+        self._transaction(work)
+
+    def release(self, worker, doc_ids):
+        """节点退出时归还尚未处理的论文，不计入尝试次数"""
+        def work(conn):
+            conn.executemany(
+                "UPDATE tasks SET status = ?, worker = NULL, lease_until = NULL, attempts = attempts - 1, "
+                "updated_at = ? WHERE doc_id = ? AND status = ? AND worker = ?",
+                [(QUEUED, time.time(), doc_id, LEASED, worker) for doc_id in doc_ids])
+        self._transaction(work)
+
+    def collect(self, limit=100):
+        """取出已完成但尚未保存的结果: [(论文ID, 关键词, 页码, 结果)]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT doc_id, keyword, page, result FROM tasks WHERE status = ? ORDER BY keyword, page LIMIT ?",
+                (DONE, limit)).fetchall()
+
+    def mark_collected(self, doc_ids):
+        """标记结果已保存，释放结果占用的空间"""
+        def work(conn):
+            conn.executemany("UPDATE tasks SET status = ?, result = NULL, updated_at = ? WHERE doc_id = ?",
+                             [(COLLECTED, time.time(), doc_id) for doc_id in doc_ids])
+        self._transaction(work)
+
+    def failed(self):
+        """重试后仍然失败的论文: [(论文ID, 关键词, 页码, 错误信息)]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT doc_id, keyword, page, last_error FROM tasks WHERE status = ?", (FAILED,)).fetchall()
+
+    def counts(self):
+        """各状态的任务数"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_work_queue(url=None):
+    """按WORK_QUEUE_URL打开工作队列，目前支持 sqlite:///路径
+
+    其他后端（如Redis）只需实现相同的方法并在这里按URL前缀返回。
+    """
+    url = url or os.getenv('WORK_QUEUE_URL', 'sqlite:///data/work_queue.db')
+    max_attempts = int(os.getenv('WORK_QUEUE_MAX_ATTEMPTS', 3))
+    if url.startswith('sqlite:///'):
+        return SqliteWorkQueue(url[len('sqlite:///'):], max_attempts)
+    raise ValueError(f"不支持的工作队列地址: {url}")